@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+# Most tests hammer the API from a single TestClient address; rate limiting is
+# exercised explicitly in test_rate_limit.py.
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+# Set DB_PATH before importing app so module-level DB_PATH is initialized correctly
+os.environ['DB_PATH'] = os.path.join(os.getcwd(), 'backend', 'tests', 'test_neurovault.sqlite3')
+
+import backend.app_run as appmod  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _shared_db_file():
+    yield
+    try:
+        os.remove(os.environ['DB_PATH'])
+    except Exception:
+        pass
+
+
+@pytest.fixture
+def db_settings():
+    """App module attributes to patch before each test's fresh database is created.
+
+    Override this fixture in a test module to change them, e.g. chunk sizes,
+    SHARD_COUNT or directories under tmp_path.
+    """
+    return {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_db(tmp_path, monkeypatch, db_settings):
+    monkeypatch.setattr(appmod, 'DB_PATH', str(tmp_path / 'neurovault.sqlite3'))
+    for name, value in db_settings.items():
+        monkeypatch.setattr(appmod, name, value)
+    appmod.init_db()
@@ -0,0 +1,55 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def _seed(n):
+    return [client.post('/memories', json={'title': f'm{i}', 'summary': f'anchored {i}', 'agent': 'a'}).json()['id']
+            for i in range(n)]
+
+
+def test_every_memory_gets_a_proof_against_its_batch_root():
+    ids = _seed(7)
+    assert client.get(f'/memories/{ids[0]}/proof').status_code == 404  # not batched yet
+    batch = client.post('/anchors/batch').json()
+    assert batch['size'] == 7
+    for mid in ids:
+        p = client.get(f'/memories/{mid}/proof').json()
+        assert p['root'] == batch['root'] and p['batch_id'] == batch['batch_id']
+        leaf = appmod.merkle_leaf(mid, p['content_hash'])
+        assert p['leaf'] == leaf.hex()
+        assert appmod.verify_merkle_proof(leaf, p['proof'], bytes.fromhex(p['root']))
+        assert not appmod.verify_merkle_proof(appmod.merkle_leaf(mid, 'tampered'), p['proof'], bytes.fromhex(p['root']))
+    # only new memories go into the next batch
+    more = _seed(1)
+    second = client.post('/anchors/batch').json()
+    assert second['size'] == 1
+    p = client.get(f'/memories/{more[0]}/proof').json()
+    assert p['proof'] == [] and p['root'] == p['leaf']
+    assert client.post('/anchors/batch').json()['size'] == 0
+    assert client.get('/memories/9999/proof').status_code == 404
+
+
+def test_batches_are_bounded_and_anchored_by_root(monkeypatch):
+    _seed(5)
+    monkeypatch.setattr(appmod, 'MERKLE_BATCH_MAX', 2)
+    sizes = [client.post('/anchors/batch').json()['size'] for _ in range(4)]
+    assert sizes == [2, 2, 1, 0]
+    sent = []
+    assert appmod.anchor_pending_batches(lambda batch_id, root: sent.append((batch_id, root)) or f'0x{batch_id:064x}') == 3
+    assert [b for b, _ in sent] == [1, 2, 3]
+    p = client.get('/memories/1/proof').json()
+    assert p['anchored_tx'] == f'0x{1:064x}' and p['anchored_at']
+    assert appmod.anchor_pending_batches(lambda *a: pytest.fail('already anchored')) == 0
+
+
+def test_large_tree_proofs():
+    leaves = [appmod.merkle_leaf(i, str(i)) for i in range(100001)]
+    started = time.perf_counter()
+    levels = appmod.build_merkle_levels(leaves)
+    assert time.perf_counter() - started < 10
+    assert [len(level) for level in levels] == appmod._level_sizes(len(leaves))
+    assert len(levels[-1]) == 1
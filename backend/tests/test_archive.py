@@ -0,0 +1,87 @@
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings():
+    # /validate/rescore swaps the module-level engine; put the original back afterwards
+    return {'SCORING_ENGINE': appmod.SCORING_ENGINE}
+
+
+def _seed():
+    ids = []
+    for i in range(4):
+        r = client.post('/memories', json={'title': f'm{i}', 'summary': f'important research note {i} ' * 20,
+                                           'agent': 'archivist', 'metadata': {'n': i}})
+        ids.append(r.json()['id'])
+    # the first three are old and finalized; the last stays pending
+    for mid in ids[:3]:
+        client.post('/validate', json={'memory_id': mid, 'score': 80, 'valid': mid != ids[1]})
+    conn = sqlite3.connect(appmod.DB_PATH)
+    conn.execute("UPDATE memories SET created_at = datetime('now', '-90 days') WHERE id != ?", (ids[2],))
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def _raw(mid):
+    conn = sqlite3.connect(appmod.DB_PATH)
+    row = conn.execute('SELECT summary, metadata, embedding FROM memories WHERE id = ?', (mid,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_only_old_finalized_rows_are_archived():
+    ids = _seed()
+    before = {mid: client.get(f'/memories/{mid}').json()['memory'] for mid in ids}
+    assert client.post('/archive/run').json() == {'archived': 2}
+    assert client.post('/archive/run').json() == {'archived': 0}
+    assert _raw(ids[0])[:2] == (None, None) and _raw(ids[0])[2]
+    assert _raw(ids[2])[0] is not None  # finalized but recent
+    assert _raw(ids[3])[0] is not None  # old but still pending
+    for mid in ids:
+        assert client.get(f'/memories/{mid}').json()['memory'] == before[mid]
+
+
+def test_archived_columns_are_restored_on_every_read_path():
+    ids = _seed()
+    client.post('/archive/run')
+    summary = 'important research note 0 ' * 20
+    listed = client.get('/memories', params={'fields': 'title,summary,metadata'}).json()
+    assert {'title': 'm0', 'summary': summary, 'metadata': '{"n": 0}'} in listed
+    assert all(set(row) == {'title', 'summary', 'metadata'} for row in listed)
+    multi = client.get('/memories', params={'ids': str(ids[0]), 'validations': 'latest'}).json()
+    assert multi[0]['summary'] == summary and multi[0]['latest_validation']['valid'] == 1
+    agent = client.get('/agent/archivist', params={'fields': 'id,summary'}).json()
+    assert {'id': ids[1], 'summary': 'important research note 1 ' * 20} in agent
+    similar = client.get('/similar', params={'q': summary, 'limit': 10}).json()
+    assert next(r for r in similar if r['id'] == ids[0])['summary'] == summary
+
+
+def test_rescore_sees_archived_text():
+    ids = _seed()
+    first = client.post('/validate/rescore', json={'status': 'PASSED', 'dry_run': True}).json()
+    client.post('/archive/run')
+    assert client.post('/validate/rescore', json={'status': 'PASSED', 'dry_run': True}).json() == first
+
+
+def test_hot_rows_are_not_copied():
+    _seed()
+    client.post('/archive/run')
+    conn = appmod.get_db()
+    c = conn.cursor()
+    c.row_factory = None
+    cols = ['id', 'title', 'summary']
+    rows = c.execute('SELECT id, title, summary FROM memories ORDER BY id').fetchall()
+    restored = appmod._restore_archived(c, rows, cols)
+    hot = [i for i, r in enumerate(rows) if r[2] is not None]
+    assert hot and all(restored[i] is rows[i] for i in hot)
+    assert restored[0][2] == 'important research note 0 ' * 20
+    # nothing archived among them: the very same list comes back
+    hot_only = [rows[i] for i in hot]
+    assert appmod._restore_archived(c, hot_only, cols) is hot_only
+    conn.close()
@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings():
+    return {'SIMILAR_SCAN_CHUNK': 7}
+
+
+def _add(summary):
+    return client.post('/memories', json={'title': summary, 'summary': summary, 'agent': 'tester'}).json()['id']
+
+
+def test_build_and_browse_clusters():
+    ids = [_add(f'cluster seed {i}') for i in range(30)]
+    appmod.build_clusters(k=4, epochs=3)
+    clusters = client.get('/clusters').json()
+    assert len(clusters) == 4
+    assert sum(cl['size'] for cl in clusters) == len(ids)
+    members = []
+    for cl in clusters:
+        rows = client.get(f"/clusters/{cl['id']}/memories", params={'limit': 100}).json()
+        assert len(rows) == cl['size']
+        members += [r['id'] for r in rows]
+    assert sorted(members) == sorted(ids)
+    assert client.get('/clusters/99/memories').status_code == 404
+
+    # new memories are assigned incrementally
+    new_id = _add('arrives after clustering')
+    clusters = client.get('/clusters').json()
+    assert sum(cl['size'] for cl in clusters) == len(ids) + 1
+    found = [cl['id'] for cl in clusters
+             if new_id in [r['id'] for r in client.get(f"/clusters/{cl['id']}/memories").json()]]
+    assert len(found) == 1
+
+
+def test_similar_probes_scan_a_subset():
+    for i in range(30):
+        _add(f'probe row {i}')
+    appmod.build_clusters(k=5)
+    exact = client.get('/similar', params={'q': 'probe row 3', 'limit': 3}).json()
+    assert client.get('/similar', params={'q': 'probe row 3', 'limit': 3, 'probes': 5}).json() == exact
+    probed = client.get('/similar', params={'q': 'probe row 3', 'limit': 3, 'probes': 1}).json()
+    assert 0 < len(probed) <= 3
+    # the best hit from a single probe can never beat the exact answer
+    assert probed[0]['score'] <= exact[0]['score'] + 1e-9
+
+
+def test_build_never_blocks_writers_and_keeps_late_rows(monkeypatch):
+    import sqlite3
+    for i in range(30):
+        _add(f'busy row {i}')
+    keyed = appmod._keyed_chunks
+    late, passes = [], []
+
+    def chunks_with_writer(c, after=0):
+        passes.append(1)
+        for chunk in keyed(c, after):
+            yield chunk
+            # only during the final assignment pass (after sampling and one epoch)
+            if len(passes) < 3 or len(late) >= 6:
+                continue
+            # a writer that refuses to wait at all still gets in between chunks
+            other = sqlite3.connect(appmod.DB_PATH, timeout=0)
+            cur = other.execute("INSERT INTO memories (agent, title, summary) VALUES ('w', 'late', 'late row')")
+            late.append(cur.lastrowid)
+            other.commit()
+            other.close()
+    monkeypatch.setattr(appmod, '_keyed_chunks', chunks_with_writer)
+    appmod.build_clusters(k=3, epochs=1)
+    assert len(late) == 6
+    clusters = client.get('/clusters').json()
+    assert sum(cl['size'] for cl in clusters) == 30 + len(late)
+
+
+def test_startup_build_skips_existing_clusters(monkeypatch):
+    for i in range(10):
+        _add(f'kept {i}')
+    calls = []
+    monkeypatch.setattr(appmod, 'build_clusters', lambda: calls.append(1))
+    appmod._build_missing_clusters()
+    assert calls == [1]
+    conn = appmod.get_db()
+    conn.execute("INSERT INTO clusters (id, centroid, size) VALUES (0, '[1]', 10)")
+    conn.commit()
+    conn.close()
+    appmod._build_missing_clusters()
+    assert calls == [1]
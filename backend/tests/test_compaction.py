@@ -0,0 +1,80 @@
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def _seed():
+    """Two memories; memory A gets 6 old validations from two validators and one recent one."""
+    a = client.post('/memories', json={'title': 'a', 'summary': 'a', 'agent': 'x'}).json()['id']
+    b = client.post('/memories', json={'title': 'b', 'summary': 'b', 'agent': 'x'}).json()['id']
+    for i, score in enumerate([10, 50, 90, 30, 70, 20]):
+        client.post('/validate', json={'memory_id': a, 'validator': f'v{i % 2}', 'score': score, 'valid': score >= 50})
+    client.post('/validate', json={'memory_id': b, 'validator': 'v0', 'score': 40, 'valid': False})
+    conn = sqlite3.connect(appmod.DB_PATH)
+    conn.execute("UPDATE validations SET created_at = datetime('now', '-200 days')")
+    conn.commit()
+    conn.close()
+    client.post('/validate', json={'memory_id': a, 'validator': 'v0', 'score': 60, 'valid': True})
+    return a, b
+
+
+def _raw_count():
+    conn = sqlite3.connect(appmod.DB_PATH)
+    n = conn.execute('SELECT COUNT(*) FROM validations').fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_old_validations_roll_up_per_memory_and_validator():
+    a, b = _seed()
+    before = client.get('/memories', params={'ids': f'{a},{b}', 'validations': 'summary'}).json()
+    assert client.post('/validations/compact').json() == {'compacted': 7, 'checkpoint': 7}
+    assert _raw_count() == 1
+    history = {h['validator']: h for h in client.get(f'/memories/{a}').json()['validation_history']}
+    assert history['v0']['count'] == 3 and history['v0']['mean_score'] == pytest.approx(170 / 3)
+    assert (history['v0']['min_score'], history['v0']['max_score']) == (10, 90)
+    assert history['v1']['passed'] == 1 and history['v1']['last_score'] == 20
+    # aggregates over raw + rolled-up rows are unchanged by compaction
+    after = client.get('/memories', params={'ids': f'{a},{b}', 'validations': 'summary'}).json()
+    assert after == before
+    latest = client.get('/memories', params={'ids': str(b), 'validations': 'latest'}).json()[0]['latest_validation']
+    assert latest['score'] == 40 and latest['validator'] == 'v0'
+    assert client.post('/validations/compact').json() == {'compacted': 0, 'checkpoint': 7}
+
+
+def test_interrupted_compaction_resumes_from_checkpoint():
+    a, _ = _seed()
+    first = appmod.compact_validations(batch=2, max_batches=2)
+    assert first == {'compacted': 4, 'checkpoint': 4}
+    assert _raw_count() == 4
+    rest = appmod.compact_validations(batch=2)
+    assert rest == {'compacted': 3, 'checkpoint': 7}
+    history = client.get(f'/memories/{a}').json()['validation_history']
+    assert sum(h['count'] for h in history) == 6
+
+
+def test_new_databases_vacuum_incrementally():
+    conn = sqlite3.connect(appmod.DB_PATH)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.close()
+
+
+def test_recent_row_before_old_ones_is_kept():
+    # ids out of order with created_at, as after a rebalance or clock skew
+    a = client.post('/memories', json={'title': 'a', 'summary': 'a', 'agent': 'x'}).json()['id']
+    client.post('/validate', json={'memory_id': a, 'validator': 'v0', 'score': 10, 'valid': False})
+    client.post('/validate', json={'memory_id': a, 'validator': 'v0', 'score': 20, 'valid': False})
+    client.post('/validate', json={'memory_id': a, 'validator': 'v0', 'score': 30, 'valid': False})
+    conn = sqlite3.connect(appmod.DB_PATH)
+    conn.execute("UPDATE validations SET created_at = datetime('now', '-200 days') WHERE id <> 2")
+    conn.commit()
+    conn.close()
+    assert appmod.compact_validations() == {'compacted': 1, 'checkpoint': 1}
+    conn = sqlite3.connect(appmod.DB_PATH)
+    assert [r[0] for r in conn.execute('SELECT score FROM validations ORDER BY id')] == [20, 30]
+    conn.close()
+    history = client.get(f'/memories/{a}').json()['validation_history']
+    assert [(h['count'], h['mean_score']) for h in history] == [(1, 10)]
@@ -0,0 +1,39 @@
+import struct
+from array import array
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def test_embed_single_text_keeps_legacy_shape():
+    r = client.post('/embed', json={'text': 'hello world'})
+    assert r.status_code == 200
+    assert r.json() == {'embedding': appmod.deterministic_embedding('hello world')}
+
+
+def test_embed_batch_json_and_binary(monkeypatch):
+    monkeypatch.setattr(appmod, 'EMBED_CHUNK', 2)
+    texts = [f'text {i}' for i in range(5)]
+    r = client.post('/embed', json={'texts': texts})
+    assert r.status_code == 200
+    data = r.json()
+    assert data['dim'] == 8
+    assert data['embeddings'] == [appmod.deterministic_embedding(t) for t in texts]
+
+    r = client.post('/embed', json={'texts': texts}, headers={'Accept': 'application/octet-stream'})
+    assert r.status_code == 200
+    assert r.headers['content-type'] == 'application/octet-stream'
+    magic, rows, dim = struct.unpack('<4sII', r.content[:12])
+    assert (magic, rows, dim) == (b'NVE1', 5, 8)
+    values = array('f', r.content[12:])
+    assert len(values) == rows * dim
+    for i, t in enumerate(texts):
+        expected = appmod.deterministic_embedding(t)
+        assert all(abs(a - b) < 1e-6 for a, b in zip(values[i * dim:(i + 1) * dim], expected))
+
+
+def test_embed_requires_input_and_caps_batch(monkeypatch):
+    assert client.post('/embed', json={}).status_code == 400
+    monkeypatch.setattr(appmod, 'MAX_EMBED_BATCH', 2)
+    assert client.post('/embed', json={'texts': ['a', 'b', 'c']}).status_code == 400
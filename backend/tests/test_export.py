@@ -0,0 +1,104 @@
+import gzip
+import json
+import sqlite3
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings():
+    return {'EXPORT_CHUNK': 3, 'EXPORT_FLUSH_BYTES': 64}
+
+
+def _seed():
+    ids = []
+    for i in range(8):
+        ids.append(client.post('/memories', json={'title': f't{i}', 'summary': f's{i}', 'agent': 'ab'[i % 2],
+                                                  'category': 'research' if i < 5 else 'misc'}).json()['id'])
+    client.post('/validate', json={'memory_id': ids[1], 'validator': 'v', 'score': 80, 'valid': True})
+    client.post('/validate', json={'memory_id': ids[1], 'validator': 'w', 'score': 20, 'valid': False})
+    client.post('/validate', json={'memory_id': ids[6], 'validator': 'v', 'score': 90, 'valid': True})
+    return ids
+
+
+def _lines(r):
+    assert r.headers['content-type'] == 'application/x-ndjson'
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def test_streams_every_memory_in_id_order():
+    ids = _seed()
+    rows = _lines(client.get('/export'))
+    assert [r['id'] for r in rows] == ids
+    assert 'embedding' not in rows[0] and rows[0]['title'] == 't0'
+
+
+def test_filters_and_resume():
+    ids = _seed()
+    rows = _lines(client.get('/export?agent=a&category=research'))
+    assert [r['id'] for r in rows] == [ids[0], ids[2], ids[4]]
+    rows = _lines(client.get('/export?status=FAILED'))
+    assert [r['id'] for r in rows] == [ids[1]]
+    rows = _lines(client.get(f'/export?min_id={ids[2]}&max_id={ids[5]}&fields=id,title'))
+    assert rows == [{'id': i, 'title': f't{n}'} for n, i in enumerate(ids) if 2 <= n <= 5]
+    # resuming after a cut picks up exactly the remainder
+    first = _lines(client.get('/export'))[:4]
+    rest = _lines(client.get(f'/export?min_id={first[-1]["id"] + 1}'))
+    assert [r['id'] for r in first + rest] == ids
+
+
+def test_validations_and_gzip():
+    ids = _seed()
+    r = client.get('/export?validations=true&fields=id', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['content-encoding'] == 'gzip'
+    rows = _lines(r)
+    by_id = {row['id']: row for row in rows}
+    assert [(v['validator'], v['score']) for v in by_id[ids[1]]['validations']] == [('v', 80.0), ('w', 20.0)]
+    assert [v['validator'] for v in by_id[ids[6]]['validations']] == ['v']
+    assert by_id[ids[0]]['validations'] == [] and by_id[ids[0]]['validation_history'] == []
+    # several flushed blocks still make one gzip member
+    with client.stream('GET', '/export?fields=id', headers={'Accept-Encoding': 'gzip'}) as s:
+        body = b''.join(s.iter_raw())
+    assert [json.loads(line)['id'] for line in gzip.decompress(body).splitlines()] == ids
+
+
+def test_archived_rows_and_shards(tmp_path, monkeypatch):
+    ids = _seed()
+    conn = sqlite3.connect(appmod.DB_PATH)
+    conn.execute("UPDATE memories SET status = 'PASSED', created_at = datetime('now', '-400 days')")
+    conn.commit()
+    conn.close()
+    appmod.archive_cold_memories(30)
+    rows = _lines(client.get('/export?fields=id,summary'))
+    assert [r['summary'] for r in rows] == [f's{i}' for i in range(8)]
+
+    monkeypatch.setattr(appmod, 'DB_PATH', str(tmp_path / 'catalog.sqlite3'))
+    monkeypatch.setattr(appmod, 'SHARD_COUNT', 3)
+    monkeypatch.setattr(appmod, 'SHARD_DIR', str(tmp_path / 'shards'))
+    appmod.init_db()
+    ids = [client.post('/memories', json={'title': 't', 'summary': 's', 'agent': agent}).json()['id']
+           for agent in ['alice', 'bob', 'carol', 'dave', 'erin', 'frank'] * 2]
+    assert [r['id'] for r in _lines(client.get('/export?fields=id'))] == ids
+    assert [r['id'] for r in _lines(client.get('/export?fields=id&agent=carol'))] == [ids[2], ids[8]]
+
+
+def test_download_holds_a_bulk_slot(monkeypatch):
+    _seed()
+    bulk = appmod.WORK_CLASSES['bulk']
+    seen = []
+    dumps = appmod._dumps
+
+    def spy(obj):
+        seen.append((bulk.pending, threading.current_thread().name))
+        return dumps(obj)
+    monkeypatch.setattr(appmod, '_dumps', spy)
+    assert len(_lines(client.get('/export?fields=id'))) == 8
+    assert all(pending == 1 and name.startswith('nv-bulk') for pending, name in seen)
+    assert bulk.pending == 0
+    monkeypatch.setattr(bulk, 'capacity', 0)
+    r = client.get('/export')
+    assert r.status_code == 503 and r.headers['retry-after'] == '1'
@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def _varint(n):
+    out = b''
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out += bytes([b | 0x80])
+        else:
+            return out + bytes([b])
+
+
+def _field(num, value):
+    return _varint(num << 3 | 2) + _varint(len(value)) + value
+
+
+def raw_cid(block):
+    cid = b'\x01' + _varint(0x55) + b'\x12\x20' + hashlib.sha256(block).digest()
+    return 'b' + base64.b32encode(cid).decode().lower().rstrip('='), cid
+
+
+def dag_pb_file(children):
+    """A CIDv0 UnixFS file node linking to raw leaves, the way `ipfs add --raw-leaves` chunks."""
+    links = b''.join(_field(2, _field(1, cid_bytes)) for _, cid_bytes in children)
+    unixfs = _varint(1 << 3) + _varint(2)  # Type = File
+    block = links + _field(1, unixfs)
+    mh = b'\x12\x20' + hashlib.sha256(block).digest()
+    return appmod._b58encode(mh), block
+
+
+class Gateway(BaseHTTPRequestHandler):
+    blocks = {}
+    hits = []
+    gate = None
+
+    def do_GET(self):
+        cid = self.path.split('/ipfs/')[1].split('?')[0]
+        self.hits.append(cid)
+        if self.gate is not None:
+            self.gate.wait(5)
+        block = self.blocks.get(cid)
+        if block is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(block)))
+        self.end_headers()
+        self.wfile.write(block)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gateway(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Gateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Gateway.blocks, Gateway.hits, Gateway.gate = {}, [], None
+    cache = appmod.BlobCache(str(tmp_path / 'blobs'), 1 << 20, f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(appmod, 'BLOB_CACHE', cache)
+    yield Gateway
+    server.shutdown()
+
+
+def _publish(gw, data):
+    cid, cid_bytes = raw_cid(data)
+    gw.blocks[cid] = data
+    return cid, cid_bytes
+
+
+def test_proxy_caches_verified_payloads(gateway):
+    cid, _ = _publish(gateway, b'{"title": "hello"}')
+    r = client.get(f'/ipfs/{cid}')
+    assert r.status_code == 200 and r.content == b'{"title": "hello"}'
+    assert r.headers['x-cache'] == 'MISS' and 'immutable' in r.headers['cache-control']
+    r = client.get(f'/ipfs/{cid}')
+    assert r.headers['x-cache'] == 'HIT' and r.content == b'{"title": "hello"}'
+    assert gateway.hits == [cid]
+
+
+def test_multi_block_files_are_reassembled(gateway):
+    parts = [_publish(gateway, chunk) for chunk in (b'first chunk, ', b'second chunk')]
+    root, block = dag_pb_file(parts)
+    gateway.blocks[root] = block
+    assert client.get(f'/ipfs/{root}').content == b'first chunk, second chunk'
+
+
+def test_tampered_content_is_rejected_and_not_cached(gateway):
+    cid, _ = raw_cid(b'original')
+    gateway.blocks[cid] = b'forged'
+    r = client.get(f'/ipfs/{cid}')
+    assert r.status_code == 502 and 'does not match' in r.json()['detail']
+    assert appmod.BLOB_CACHE.lookup(cid) is None
+    assert client.get('/ipfs/not-a-cid').status_code == 400
+
+
+def test_range_requests(gateway):
+    cid, _ = _publish(gateway, b'0123456789')
+    r = client.get(f'/ipfs/{cid}', headers={'Range': 'bytes=2-5'})
+    assert r.status_code == 206 and r.content == b'2345'
+    assert r.headers['content-range'] == 'bytes 2-5/10'
+    assert client.get(f'/ipfs/{cid}', headers={'Range': 'bytes=-3'}).content == b'789'
+    assert client.get(f'/ipfs/{cid}', headers={'Range': 'bytes=7-'}).content == b'789'
+    assert client.get(f'/ipfs/{cid}', headers={'Range': 'bytes=20-'}).status_code == 416
+
+
+def test_concurrent_misses_share_one_fetch(gateway):
+    cid, _ = _publish(gateway, b'popular payload')
+    gateway.gate = threading.Event()
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(appmod.BLOB_CACHE.get, cid) for _ in range(8)]
+        while not gateway.hits:
+            pass
+        gateway.gate.set()
+        paths = {f.result()[0] for f in futures}
+    assert len(paths) == 1 and gateway.hits == [cid]
+
+
+def test_least_recently_read_is_evicted(gateway):
+    appmod.BLOB_CACHE.max_bytes = 25
+    a, _ = _publish(gateway, b'a' * 10)
+    b, _ = _publish(gateway, b'b' * 10)
+    c, _ = _publish(gateway, b'c' * 10)
+    appmod.BLOB_CACHE.get(a)
+    appmod.BLOB_CACHE.get(b)
+    appmod.BLOB_CACHE.get(a)  # a is now the most recent
+    appmod.BLOB_CACHE.get(c)
+    assert appmod.BLOB_CACHE.lookup(b) is None
+    assert appmod.BLOB_CACHE.lookup(a) and appmod.BLOB_CACHE.lookup(c)
+    assert sorted(os.listdir(appmod.BLOB_CACHE.root)) == sorted([a, c])
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def _add(title):
+    return client.post('/memories', json={'title': title, 'summary': title, 'agent': 'multi'}).json()['id']
+
+
+def _validate(mid, score, valid):
+    client.post('/validate', json={'memory_id': mid, 'score': score, 'valid': valid, 'validator': 'v'})
+
+
+def test_multi_get_preserves_order_and_skips_missing():
+    a, b, c = _add('a'), _add('b'), _add('c')
+    rows = client.get('/memories', params={'ids': f'{c},999,{a}', 'fields': 'id,title'}).json()
+    assert rows == [{'id': c, 'title': 'c'}, {'id': a, 'title': 'a'}]
+    assert client.get('/memories', params={'ids': 'x,1'}).status_code == 400
+
+
+def test_multi_get_with_latest_validation_and_summary():
+    a, b = _add('a'), _add('b')
+    _validate(a, 30.0, False)
+    _validate(a, 80.0, True)
+    rows = client.get('/memories', params={'ids': f'{a},{b}', 'fields': 'title', 'validations': 'latest'}).json()
+    assert rows[0]['title'] == 'a'
+    assert rows[0]['latest_validation']['score'] == 80.0
+    assert rows[0]['latest_validation']['memory_id'] == a
+    assert rows[1]['latest_validation'] is None
+
+    rows = client.get('/memories', params={'ids': f'{a},{b}', 'validations': 'summary'}).json()
+    assert rows[0]['validation_summary'] == {'count': 2, 'avg_score': 55.0, 'passed': 1,
+                                             'latest_valid': 1, 'latest_at': rows[0]['validation_summary']['latest_at']}
+    assert rows[1]['validation_summary']['count'] == 0
+    assert rows[0]['status'] == 'PASSED'
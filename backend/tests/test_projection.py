@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture(autouse=True)
+def seeded(fresh_db):
+    for i in range(3):
+        mid = client.post('/memories', json={'title': f't{i}', 'summary': f's{i}', 'agent': 'proj'}).json()['id']
+        client.post('/validate', json={'memory_id': mid, 'score': 60.0, 'valid': True, 'validator': 'v'})
+
+
+def test_lists_leave_out_embeddings_by_default():
+    rows = client.get('/memories').json()
+    assert len(rows) == 3
+    assert 'embedding' not in rows[0]
+    assert set(rows[0]) == set(appmod.DEFAULT_MEMORY_FIELDS)
+    assert [r['id'] for r in rows] == sorted((r['id'] for r in rows), reverse=True)
+    assert 'embedding' in client.get('/memories', params={'fields': 'all'}).json()[0]
+
+
+def test_fields_projection_on_list_endpoints():
+    rows = client.get('/agent/proj', params={'fields': 'id,title'}).json()
+    assert rows == [{'id': 3, 'title': 't2'}, {'id': 2, 'title': 't1'}, {'id': 1, 'title': 't0'}]
+    vals = client.get('/validations', params={'fields': 'memory_id,score,valid'}).json()
+    assert vals[0] == {'memory_id': 3, 'score': 60.0, 'valid': 1}
+    assert client.get('/memories', params={'fields': 'id,password'}).status_code == 400
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings():
+    return {'RATE_LIMIT_ENABLED': True}
+
+
+@pytest.fixture(autouse=True)
+def limited(fresh_db):
+    appmod.RATE_LIMITER.reset()
+    yield
+    appmod.RATE_LIMITER.reset()
+
+
+def test_headers_and_429_once_bucket_is_empty():
+    capacity = int(appmod.RATE_LIMITS['validate'][0])
+    r = client.post('/validate', json={'memory_id': 1, 'score': 1.0, 'valid': True, 'validator': 'v1'})
+    assert r.status_code == 200
+    assert r.headers['x-ratelimit-limit'] == str(capacity)
+    assert r.headers['x-ratelimit-remaining'] == str(capacity - 1)
+    for _ in range(capacity - 1):
+        client.post('/validate', json={'memory_id': 1, 'score': 1.0, 'valid': True, 'validator': 'v1'})
+    r = client.post('/validate', json={'memory_id': 1, 'score': 1.0, 'valid': True, 'validator': 'v1'})
+    assert r.status_code == 429
+    assert int(r.headers['retry-after']) >= 1
+    # other route classes keep their own buckets
+    assert client.get('/similar', params={'q': 'x'}).status_code == 200
+
+
+def test_memory_store_buckets_per_key_and_refill():
+    store = appmod.MemoryBucketStore()
+    assert store.take('memories:agent:a', 2, 2 / 60, 0)[0]
+    assert store.take('memories:agent:a', 2, 2 / 60, 0)[0]
+    assert not store.take('memories:agent:a', 2, 2 / 60, 1)[0]
+    assert store.take('memories:agent:b', 2, 2 / 60, 1)[0]
+    # refills at the configured rate
+    assert store.take('memories:agent:a', 2, 2 / 60, 31)[0]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'buckets.sqlite3')
+    a = appmod.SqliteBucketStore(path)
+    b = appmod.SqliteBucketStore(path)
+    assert a.take('k', 1, 0.001, 100)[0]
+    assert not b.take('k', 1, 0.001, 100)[0]
+
+
+def test_agents_behind_one_ip_do_not_starve_each_other(monkeypatch):
+    monkeypatch.setitem(appmod.RATE_LIMITS, 'validate', (2.0, 60.0))
+    monkeypatch.setitem(appmod.RATE_LIMITS_IP, 'validate', (5.0, 60.0))
+
+    def post(validator):
+        return client.post('/validate', json={'memory_id': 1, 'score': 1.0, 'valid': True, 'validator': validator})
+    assert [post('a').status_code for _ in range(3)] == [200, 200, 429]
+    r = post('b')
+    assert r.status_code == 200 and r.headers['x-ratelimit-limit'] == '2'
+    assert r.headers['x-ratelimit-remaining'] == '1'
+    # the shared address still has its own, wider cap
+    assert [post(f'c{i}').status_code for i in range(2)] == [200, 429]
+    assert appmod.RATE_LIMITS_IP['search'][0] == 5 * appmod.RATE_LIMITS['search'][0]
+
+
+def test_blocking_store_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    store = appmod.SqliteBucketStore(str(tmp_path / 'buckets.sqlite3'))
+    on_loop = []
+    take = store.take
+
+    def spy(*args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return take(*args)
+    monkeypatch.setattr(store, 'take', spy)
+    monkeypatch.setattr(appmod, 'RATE_LIMITER', store)
+    assert client.get('/memories', headers={'X-Agent': 'a'}).status_code == 200
+    assert on_loop == [False, False]
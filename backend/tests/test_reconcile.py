@@ -0,0 +1,129 @@
+import json
+import hashlib
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings(tmp_path):
+    return {'INDEXER_DB_PATH': str(tmp_path / 'indexer.db')}
+
+
+def _events_db(events):
+    """A database laid out the way infra/indexer.js writes it."""
+    conn = sqlite3.connect(appmod.INDEXER_DB_PATH)
+    conn.execute('''CREATE TABLE IF NOT EXISTS events (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      event_type TEXT NOT NULL,
+      block_number INTEGER NOT NULL,
+      transaction_hash TEXT NOT NULL,
+      log_index INTEGER NOT NULL,
+      args TEXT NOT NULL,
+      indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE(transaction_hash, log_index)
+    )''')
+    for i, (event_type, block, args) in enumerate(events):
+        conn.execute('INSERT INTO events (event_type, block_number, transaction_hash, log_index, args) VALUES (?, ?, ?, ?, ?)',
+                     (event_type, block, f'0xtx{block}', i, json.dumps(args)))
+    conn.commit()
+    conn.close()
+
+
+def _submitted(chain_id, cid='', content_hash='', title='t'):
+    return {'memoryId': str(chain_id), 'submitter': '0xabc', 'ipfsCid': cid, 'contentHash': content_hash,
+            'title': title, 'category': 'research'}
+
+
+def _validated(chain_id, score, valid):
+    return {'memoryId': str(chain_id), 'validator': '0xval', 'isValid': valid, 'score': str(score),
+            'explanation': 'checked on chain'}
+
+
+def test_links_existing_memories_and_creates_missing_ones():
+    digest = hashlib.sha256(b'known').hexdigest()
+    by_hash = client.post('/memories', json={'title': 'h', 'summary': 's', 'content_hash': digest}).json()['id']
+    by_cid = client.post('/memories', json={'title': 'c', 'summary': 's', 'cid': 'bafyknown'}).json()['id']
+    _events_db([
+        ('MemorySubmitted', 10, _submitted(1, content_hash='0x' + digest.upper())),
+        ('MemorySubmitted', 11, _submitted(2, cid='bafyknown')),
+        ('MemorySubmitted', 12, _submitted(3, cid='bafynew', title='fresh')),
+        ('MemoryValidated', 13, _validated(3, 80, True)),
+        ('MemoryValidated', 14, _validated(99, 10, False)),
+        ('OwnershipTransferred', 15, {'previousOwner': '0x0', 'newOwner': '0x1'}),
+    ])
+    r = client.post('/reconcile/run').json()
+    assert r == {'events': 6, 'linked': 2, 'created': 1, 'validations': 1, 'skipped': 1, 'unmatched': 1,
+                 'checkpoint': 6}
+    conn = sqlite3.connect(appmod.DB_PATH)
+    links = dict(conn.execute('SELECT chain_memory_id, memory_id FROM chain_links'))
+    assert links[1] == by_hash and links[2] == by_cid
+    created = conn.execute('SELECT agent, title, category, cid, status, metadata FROM memories WHERE id = ?',
+                           (links[3],)).fetchone()
+    conn.close()
+    assert created[:5] == ('0xabc', 'fresh', 'research', 'bafynew', 'PASSED')
+    assert json.loads(created[5])['transaction_hash'] == '0xtx12'
+    v = client.get(f'/validations?memoryId={links[3]}').json()
+    assert [(x['validator'], x['score'], x['reason']) for x in v] == [('0xval', 80.0, 'checked on chain')]
+
+
+def test_matches_frontend_hashes_with_0x_prefix():
+    # the frontend posts keccak256 hashes as 0x-prefixed hex
+    digest = '0x' + 'ab' * 32
+    mid = client.post('/memories', json={'title': 'f', 'summary': 's', 'content_hash': digest}).json()['id']
+    _events_db([('MemorySubmitted', 1, _submitted(1, cid='bafyother', content_hash=digest))])
+    r = appmod.reconcile_events()
+    assert (r['linked'], r['created']) == (1, 0)
+    conn = sqlite3.connect(appmod.DB_PATH)
+    assert conn.execute('SELECT memory_id FROM chain_links').fetchall() == [(mid,)]
+    assert conn.execute('SELECT COUNT(*) FROM memories').fetchone()[0] == 1
+    conn.close()
+
+
+def test_resumes_from_checkpoint_without_duplicates():
+    _events_db([('MemorySubmitted', 1, _submitted(i, cid=f'bafy{i}')) for i in range(1, 6)])
+    first = appmod.reconcile_events(batch=2, max_batches=1)
+    assert first['events'] == 2 and first['checkpoint'] == 2
+    rest = appmod.reconcile_events(batch=2)
+    assert rest['created'] == 3 and rest['checkpoint'] == 5
+    again = appmod.reconcile_events(batch=2)
+    assert again['events'] == 0 and again['checkpoint'] == 5
+    # the indexer keeps appending; only the new tail is read
+    _events_db([('MemorySubmitted', 9, _submitted(1, cid='bafy1')), ('MemorySubmitted', 9, _submitted(6, cid='bafy1'))])
+    tail = appmod.reconcile_events()
+    assert (tail['events'], tail['skipped'], tail['linked'], tail['created']) == (2, 1, 1, 0)
+    conn = sqlite3.connect(appmod.DB_PATH)
+    assert conn.execute('SELECT COUNT(*) FROM memories').fetchone()[0] == 5
+    assert conn.execute('SELECT last_event_id, last_block FROM reconcile_state').fetchone() == (7, 9)
+    conn.close()
+
+
+def test_duplicate_content_in_one_batch_becomes_one_memory():
+    _events_db([('MemorySubmitted', 1, _submitted(1, cid='bafysame')), ('MemorySubmitted', 2, _submitted(2, cid='bafysame'))])
+    r = appmod.reconcile_events()
+    assert (r['created'], r['linked']) == (1, 1)
+    conn = sqlite3.connect(appmod.DB_PATH)
+    assert len(set(mid for (mid,) in conn.execute('SELECT memory_id FROM chain_links'))) == 1
+    conn.close()
+
+
+def test_sharded_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(appmod, 'DB_PATH', str(tmp_path / 'catalog.sqlite3'))
+    monkeypatch.setattr(appmod, 'SHARD_COUNT', 3)
+    monkeypatch.setattr(appmod, 'SHARD_DIR', str(tmp_path / 'shards'))
+    appmod.init_db()
+    known = client.post('/memories', json={'title': 'k', 'summary': 's', 'cid': 'bafyk', 'agent': 'erin'}).json()['id']
+    _events_db([
+        ('MemorySubmitted', 1, _submitted(1, cid='bafyk')),
+        ('MemorySubmitted', 2, _submitted(2, cid='bafyz')),
+        ('MemoryValidated', 3, _validated(1, 40, False)),
+        ('MemoryValidated', 4, _validated(2, 90, True)),
+    ])
+    r = appmod.reconcile_events()
+    assert (r['linked'], r['created'], r['validations']) == (1, 1, 2)
+    assert client.get(f'/memories/{known}').json()['memory']['status'] == 'FAILED'
+    new_id = known + 1
+    assert client.get(f'/memories/{new_id}').json()['memory']['status'] == 'PASSED'
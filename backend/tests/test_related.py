@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings():
+    return {'NEIGHBOR_K': 3}
+
+
+def _add(summary):
+    return client.post('/memories', json={'title': summary, 'summary': summary, 'agent': 'tester'}).json()['id']
+
+
+def _expected(mid):
+    # brute-force neighbours of a stored memory through the batch endpoint
+    r = client.post('/similar/batch', json={'ids': [mid], 'limit': 3}).json()[0]
+    return [x['id'] for x in r['results']]
+
+
+def test_related_after_build_and_incremental_inserts():
+    ids = [_add(f'related seed {i}') for i in range(8)]
+    appmod.build_neighbor_graph()
+    for mid in ids:
+        assert [x['id'] for x in client.get(f'/memories/{mid}/related').json()] == _expected(mid)
+    # new memories are folded into the graph by the create_memory background task
+    ids += [_add(f'late arrival {i}') for i in range(4)]
+    for mid in ids:
+        assert [x['id'] for x in client.get(f'/memories/{mid}/related').json()] == _expected(mid)
+
+
+def test_related_unknown_memory_404():
+    assert client.get('/memories/4242/related').status_code == 404
+
+
+def test_incremental_insert_spans_scan_chunks_and_startup_skips_built_graph(monkeypatch):
+    monkeypatch.setattr(appmod, 'SIMILAR_SCAN_CHUNK', 3)
+    monkeypatch.setattr(appmod, 'MAX_MULTI_GET', 2)
+    ids = [_add(f'chunked seed {i}') for i in range(7)]
+    appmod.build_neighbor_graph()
+    ids += [_add(f'chunked late {i}') for i in range(3)]
+    for mid in ids:
+        assert [x['id'] for x in client.get(f'/memories/{mid}/related').json()] == _expected(mid)
+    builds = []
+    monkeypatch.setattr(appmod, 'build_neighbor_graph', lambda: builds.append(1))
+    appmod._build_missing_neighbor_graph()
+    assert builds == []
@@ -0,0 +1,76 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings(monkeypatch):
+    monkeypatch.delenv('VALIDATION_RULES_PATH', raising=False)
+    # /validate/rescore swaps the module-level engine; put the original back afterwards
+    return {'SCORING_ENGINE': appmod.SCORING_ENGINE}
+
+
+def _legacy_score(title, summary, dupes):
+    # the original inline rules from run_validation
+    length_score = min(40, len(summary) / 5)
+    keyword_bonus = 0
+    for kw in ['important', 'remember', 'study', 'note', 'research']:
+        if kw in summary.lower() or kw in title.lower():
+            keyword_bonus += 8
+    return max(0, min(100, length_score + keyword_bonus - (20 if dupes > 1 else 0)))
+
+
+def test_automaton_finds_overlapping_terms():
+    ac = appmod.KeywordAutomaton({'note': 1, 'notebook': 2, 'book': 4, 'he': 8, 'she': 16})
+    assert ac.matches('my notebook, she said') == {'note': 1, 'notebook': 2, 'book': 4, 'he': 8, 'she': 16}
+    assert ac.matches('nothing') == {}
+
+
+def test_engine_matches_legacy_rules():
+    memories = [('Study notes', 'An important research note ' * 12), ('x', 'short'), ('REMEMBER', 'dup text'),
+                ('REMEMBER', 'dup text')]
+    for title, summary in memories:
+        client.post('/memories', json={'title': title, 'summary': summary, 'agent': 's'})
+    conn = appmod.get_db()
+    c = conn.cursor()
+    c.execute('SELECT id, title, summary, content_hash FROM memories ORDER BY id')
+    rows = c.fetchall()
+    scored = appmod.ScoringEngine(appmod.DEFAULT_SCORING_RULES).score_rows(c, rows)
+    conn.close()
+    for (title, summary), (_, score, valid, _) in zip(memories, scored):
+        dupes = sum(1 for m in memories if m == (title, summary))
+        assert score == _legacy_score(title, summary, dupes)
+        assert valid == (score >= 50)
+
+
+def test_rescore_applies_new_rules_in_bulk(tmp_path, monkeypatch):
+    for i in range(5):
+        client.post('/memories', json={'title': f'm{i}', 'summary': 'blockchain ' * 3 + str(i), 'category': 'web3'})
+    client.post('/memories', json={'title': 'other', 'summary': 'blockchain', 'category': 'art'})
+    r = client.post('/validate/rescore', json={'category': 'web3'})
+    assert r.json() == {'scored': 5, 'passed': 0, 'failed': 5, 'dry_run': False}
+
+    rules = tmp_path / 'rules.json'
+    rules.write_text(json.dumps({'keyword_sets': [{'weight': 60, 'terms': ['Blockchain']}]}))
+    monkeypatch.setenv('VALIDATION_RULES_PATH', str(rules))
+    assert client.post('/validate/rescore', json={'status': 'FAILED', 'dry_run': True}).json()['passed'] == 5
+    assert client.get('/memories', params={'status': 'PASSED'}).json() == []
+    assert client.post('/validate/rescore', json={'status': 'FAILED'}).json()['passed'] == 5
+    assert len(client.get('/memories', params={'status': 'PASSED'}).json()) == 5
+    assert client.post('/validate/rescore', json={}).status_code == 400
+
+
+def test_shared_content_hash_does_not_share_scores():
+    forged = '0x' + 'a' * 64
+    client.post('/memories', json={'title': 'a', 'summary': 'short', 'content_hash': forged})
+    client.post('/memories', json={'title': 'b', 'summary': 'important research note ' * 14, 'content_hash': forged})
+    conn = appmod.get_db()
+    c = conn.cursor()
+    c.execute('SELECT id, title, summary, content_hash FROM memories ORDER BY id')
+    first, second = appmod.ScoringEngine(appmod.DEFAULT_SCORING_RULES).score_rows(c, c.fetchall())
+    conn.close()
+    assert first[3].startswith('length=5,')
+    assert second[3].startswith('length=336,') and second[1] > first[1]
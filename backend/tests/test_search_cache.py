@@ -0,0 +1,115 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(fresh_db):
+    appmod.SEARCH_CACHE.clear()
+
+
+def test_repeated_similar_is_cached_until_a_write(monkeypatch):
+    client.post('/memories', json={'title': 'first', 'summary': 'first', 'agent': 'c'})
+    calls = []
+    real = appmod._scan_top_k
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(appmod, '_scan_top_k', counting)
+    a = client.get('/similar', params={'q': 'cached'}).json()
+    b = client.get('/similar', params={'q': 'cached'}).json()
+    assert a == b and len(calls) == 1
+    client.get('/similar', params={'q': 'cached', 'limit': 2})
+    assert len(calls) == 2
+    mid = client.post('/memories', json={'title': 'second', 'summary': 'second', 'agent': 'c'}).json()['id']
+    c = client.get('/similar', params={'q': 'cached'}).json()
+    assert len(calls) == 3
+    assert mid in [x['id'] for x in c]
+
+
+def test_concurrent_identical_requests_share_one_computation():
+    cache = appmod.ResultCache(max_entries=2, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ['result']
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute('k', compute) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert results == [['result']] * 10
+    assert len(calls) == 1
+    # a newer generation misses the cache and recomputes
+    asyncio.run(cache.get_or_compute('k', compute, generation=1))
+    assert len(calls) == 2
+
+
+def test_cache_is_bounded_and_errors_are_not_cached():
+    cache = appmod.ResultCache(max_entries=2, ttl=60)
+
+    async def value(v):
+        return v
+
+    async def boom():
+        raise ValueError('nope')
+
+    for k in 'abc':
+        asyncio.run(cache.get_or_compute(k, lambda k=k: value(k)))
+    assert list(cache._entries) == ['b', 'c']
+    with pytest.raises(ValueError):
+        asyncio.run(cache.get_or_compute('e', boom))
+    assert 'e' not in cache._entries and not cache._inflight
+
+
+class _Client:
+    def __init__(self):
+        self.gone = False
+
+    async def is_disconnected(self):
+        return self.gone
+
+
+def test_shared_search_is_cancelled_once_every_waiter_disconnects(monkeypatch):
+    monkeypatch.setattr(appmod, 'DISCONNECT_POLL_INTERVAL', 0.01)
+    work = appmod.WorkClass('test', workers=1, queue_limit=4)
+    cache = appmod.ResultCache(max_entries=2, ttl=60)
+    first, second = _Client(), _Client()
+    outcome = []
+
+    def job():
+        for _ in range(500):
+            time.sleep(0.005)
+            try:
+                appmod.check_cancelled()
+            except appmod.WorkloadCancelled:
+                outcome.append('cancelled')
+                raise
+        outcome.append('finished')
+        return ['result']
+
+    async def main():
+        compute = lambda waiters: work.run(job, request=waiters)
+        a = asyncio.ensure_future(cache.get_or_compute('k', compute, request=first))
+        await asyncio.sleep(0.02)
+        b = asyncio.ensure_future(cache.get_or_compute('k', compute, request=second))
+        await asyncio.sleep(0.02)
+        first.gone = True
+        await asyncio.sleep(0.1)
+        # the second caller is still waiting, so the work carries on
+        assert not a.done() and not outcome
+        second.gone = True
+        return await a, await b
+
+    results = asyncio.run(main())
+    assert [r.status_code for r in results] == [499, 499]
+    work.pool.shutdown(wait=True)
+    assert outcome == ['cancelled']
@@ -0,0 +1,97 @@
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+AGENTS = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank']
+
+
+@pytest.fixture
+def db_settings(tmp_path):
+    return {'SHARD_COUNT': 3, 'SHARD_DIR': str(tmp_path / 'shards')}
+
+
+def _seed(n=4):
+    ids = []
+    for i in range(n):
+        for agent in AGENTS:
+            r = client.post('/memories', json={'title': f'{agent} {i}', 'summary': f'note {i} from {agent}', 'agent': agent})
+            ids.append(r.json()['id'])
+    return ids
+
+
+def _shard_ids(shard):
+    conn = sqlite3.connect(appmod.shard_path(shard))
+    ids = [r[0] for r in conn.execute('SELECT id FROM memories')]
+    conn.close()
+    return ids
+
+
+def test_ids_are_global_and_agents_stay_on_one_shard():
+    ids = _seed()
+    assert ids == list(range(1, len(ids) + 1))
+    per_shard = [_shard_ids(s) for s in range(3)]
+    assert sorted(i for ids_ in per_shard for i in ids_) == ids
+    assert sum(1 for ids_ in per_shard if ids_) > 1
+    for agent in AGENTS:
+        mine = client.get(f'/agent/{agent}').json()
+        assert len(mine) == 4 and {m['agent'] for m in mine} == {agent}
+        assert len({appmod.memory_shard(m['id']) for m in mine}) == 1
+    mem = client.get(f'/memories/{ids[7]}').json()['memory']
+    assert mem['id'] == ids[7]
+    assert client.get('/memories/9999').status_code == 404
+
+
+def test_lists_merge_across_shards():
+    ids = _seed()
+    page = client.get('/memories', params={'limit': 5, 'offset': 3}).json()
+    assert [m['id'] for m in page] == sorted(ids, reverse=True)[3:8]
+    wanted = [ids[10], ids[0], ids[5]]
+    got = client.get('/memories', params={'ids': ','.join(map(str, wanted)), 'fields': 'id,agent'}).json()
+    assert [m['id'] for m in got] == wanted
+    assert sum(s['memories'] for s in client.get('/shards').json()) == len(ids)
+
+
+def test_similar_matches_a_single_file(tmp_path, monkeypatch):
+    _seed()
+    sharded = client.get('/similar', params={'q': 'note 2 from bob', 'limit': 6}).json()
+    monkeypatch.setattr(appmod, 'DB_PATH', str(tmp_path / 'single.sqlite3'))
+    monkeypatch.setattr(appmod, 'SHARD_COUNT', 1)
+    appmod.init_db()
+    _seed()
+    single = client.get('/similar', params={'q': 'note 2 from bob', 'limit': 6}).json()
+    assert sharded == single
+
+
+def test_validations_follow_their_memory():
+    ids = _seed(1)
+    client.post('/validate', json={'memory_id': ids[0], 'validator': 'v', 'score': 80, 'valid': True})
+    client.post('/validate/batch', json={'validations': [
+        {'memory_id': i, 'validator': 'v', 'score': 20, 'valid': False} for i in ids[1:]]})
+    assert client.get(f'/memories/{ids[0]}').json()['memory']['status'] == 'PASSED'
+    summary = client.get('/memories', params={'ids': ','.join(map(str, ids)), 'validations': 'summary'}).json()
+    assert [s['validation_summary']['count'] for s in summary] == [1] * len(ids)
+    assert len(client.get('/validations').json()) == len(ids)
+    bad = client.post('/validate/batch', json={'validations': [{'memory_id': 9999, 'score': 1, 'valid': False}]})
+    assert bad.status_code == 404
+
+
+def test_rebalance_moves_an_agent_with_its_history():
+    _seed(3)
+    mine = [m['id'] for m in client.get('/agent/alice').json()]
+    client.post('/validate', json={'memory_id': mine[0], 'validator': 'v', 'score': 70, 'valid': True})
+    source = appmod.agent_shard('alice')
+    target = (source + 1) % 3
+    r = client.post('/shards/rebalance', json={'agent': 'alice', 'shard': target})
+    assert r.json() == {'agent': 'alice', 'shard': target, 'moved': 3}
+    assert not set(mine) & set(_shard_ids(source))
+    assert set(mine) <= set(_shard_ids(target))
+    detail = client.get(f'/memories/{mine[0]}').json()
+    assert detail['memory']['status'] == 'PASSED' and len(detail['validations']) == 1
+    assert sorted(m['id'] for m in client.get('/agent/alice').json()) == sorted(mine)
+    new_id = client.post('/memories', json={'title': 'later', 'summary': 'x', 'agent': 'alice'}).json()['id']
+    assert appmod.memory_shard(new_id) == target
+    assert client.post('/shards/rebalance', json={'agent': 'alice', 'shard': target}).json()['moved'] == 0
+    assert client.post('/shards/rebalance', json={'agent': 'alice', 'shard': 7}).status_code == 400
@@ -0,0 +1,48 @@
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def _seed(summaries):
+    ids = []
+    for i, s in enumerate(summaries):
+        r = client.post('/memories', json={'title': f'm{i}', 'summary': s, 'agent': 'tester'})
+        ids.append(r.json()['id'])
+    return ids
+
+
+def test_similar_batch_matches_single_queries():
+    _seed([f'memory number {i} about topic {i % 3}' for i in range(12)])
+    queries = ['topic 1', 'something else', 'memory number 4 about topic 1']
+    r = client.post('/similar/batch', json={'queries': queries, 'limit': 3})
+    assert r.status_code == 200
+    batch = r.json()
+    assert [b['query'] for b in batch] == queries
+    for q, b in zip(queries, batch):
+        single = client.get('/similar', params={'q': q, 'limit': 3}).json()
+        assert [x['id'] for x in b['results']] == [x['id'] for x in single]
+        assert all(x['title'] for x in b['results'])
+
+
+def test_similar_batch_by_id_excludes_self_and_404s_unknown():
+    ids = _seed(['alpha', 'beta', 'gamma', 'delta'])
+    r = client.post('/similar/batch', json={'ids': ids[:2], 'limit': 10})
+    assert r.status_code == 200
+    for mid, b in zip(ids[:2], r.json()):
+        assert b['id'] == mid
+        assert mid not in [x['id'] for x in b['results']]
+        assert len(b['results']) == 3
+    assert client.post('/similar/batch', json={'ids': [9999]}).status_code == 404
+
+
+def test_similar_streams_in_chunks(monkeypatch):
+    ids = _seed([f'chunked row {i}' for i in range(25)])
+    full = client.get('/similar', params={'q': 'chunked', 'limit': 4}).json()
+    monkeypatch.setattr(appmod, 'SIMILAR_SCAN_CHUNK', 3)
+    chunked = client.get('/similar', params={'q': 'chunked', 'limit': 4}).json()
+    assert [x['id'] for x in chunked] == [x['id'] for x in full]
+    assert len(chunked) == 4
+    assert set(x['id'] for x in chunked) <= set(ids)
+    scores = [x['score'] for x in chunked]
+    assert scores == sorted(scores, reverse=True)
@@ -0,0 +1,16 @@
+import json
+from backend.validators import simulator
+
+
+def test_simulator_reports_pipeline_metrics():
+    report = simulator.simulate(validators=4, rate=20, duration=1.5, drain=3, batch_size=10,
+                                poll_interval=0.2, sample_interval=0.5, latencies=['fast'])
+    json.dumps(report)
+    assert report['submitted'] > 0
+    assert report['validated'] > 0
+    assert report['validation_posts'] >= report['validated']
+    assert 0 <= report['duplicate_rate'] < 1
+    assert report['latency_s']['p50'] is not None
+    assert report['latency_s']['p50'] <= report['latency_s']['max']
+    assert report['backlog'] and all(len(sample) == 2 for sample in report['backlog'])
+    assert report['errors']['submit'] == 0
@@ -0,0 +1,64 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings(tmp_path):
+    return {'SNAPSHOT_DIR': str(tmp_path / 'snapshots'), 'SNAPSHOT_POLL': 0,
+            'SNAPSHOTS': appmod.SnapshotSet()}
+
+
+def _write(title):
+    return client.post('/memories', json={'title': title, 'summary': title, 'agent': 'a'}).json()['id']
+
+
+def test_replica_serves_the_published_snapshot(monkeypatch):
+    first = _write('first')
+    snap = client.post('/snapshots/publish').json()
+    _write('unpublished')
+    monkeypatch.setattr(appmod, 'READ_REPLICA', True)
+    r = client.get('/memories')
+    assert [m['id'] for m in r.json()] == [first]
+    assert r.headers['X-Snapshot-Id'] == snap['id']
+    assert float(r.headers['X-Snapshot-Age']) >= 0
+    assert client.get(f'/memories/{first}').json()['memory']['title'] == 'first'
+    assert client.post('/memories', json={'title': 'x'}).status_code == 405
+
+
+def test_swaps_are_atomic_and_invisible_to_pinned_requests(monkeypatch):
+    _write('one')
+    appmod.publish_snapshot()
+    monkeypatch.setattr(appmod, 'READ_REPLICA', True)
+    pinned = appmod.SNAPSHOTS.current()
+    monkeypatch.setattr(appmod, 'READ_REPLICA', False)
+    _write('two')
+    newer = appmod.publish_snapshot()
+    monkeypatch.setattr(appmod, 'READ_REPLICA', True)
+    # a request that started on the old snapshot keeps reading it
+    token = appmod._pinned_snapshot.set(pinned)
+    try:
+        conn = appmod.get_db()
+        assert conn.execute('SELECT COUNT(*) FROM memories').fetchone()[0] == 1
+        conn.close()
+    finally:
+        appmod._pinned_snapshot.reset(token)
+    r = client.get('/memories')
+    assert r.headers['X-Snapshot-Id'] == newer['id'] and len(r.json()) == 2
+
+
+def test_replica_without_a_snapshot_is_unavailable(monkeypatch):
+    monkeypatch.setattr(appmod, 'READ_REPLICA', True)
+    r = client.get('/memories')
+    assert r.status_code == 503 and 'X-Snapshot-Id' not in r.headers
+
+
+def test_old_snapshots_are_pruned(monkeypatch):
+    monkeypatch.setattr(appmod, 'SNAPSHOT_KEEP', 2)
+    ids = [appmod.publish_snapshot()['id'] for _ in range(4)]
+    root = appmod.snapshot_root()
+    assert sorted(n for n in os.listdir(root) if n.isdigit()) == ids[-2:]
+    assert open(os.path.join(root, 'CURRENT')).read() == ids[-1]
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import os
+import threading
+import tracemalloc
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture
+def db_settings(tmp_path):
+    return {'PAYLOAD_DIR': str(tmp_path / 'payloads')}
+
+
+def test_upload_creates_memory_and_serves_payload():
+    body = b'{"title": "streamed", "notes": "' + b'x' * 200000 + b'"}'
+    r = client.post('/memories/upload', params={'title': 'streamed', 'agent': 'bot', 'metadata': '{"tags": ["a"]}'},
+                    content=body, headers={'Content-Type': 'application/json'})
+    assert r.status_code == 200
+    out = r.json()
+    assert out['size'] == len(body)
+    assert out['content_hash'] == hashlib.sha256(body).hexdigest()
+    assert appmod.parse_cid(out['cid']) == (appmod.CODEC_RAW, hashlib.sha256(body).digest())
+    mem = client.get(f"/memories/{out['id']}").json()['memory']
+    assert mem['cid'] == out['cid'] and mem['agent'] == 'bot'
+    assert mem['summary'].startswith('{"title": "streamed"') and len(mem['summary']) == appmod.UPLOAD_SUMMARY_CHARS
+    served = client.get(f"/ipfs/{out['cid']}")
+    assert served.content == body and served.headers['x-cache'] == 'HIT'
+    # same bytes again: a second memory, one stored file
+    again = client.post('/memories/upload', content=body).json()
+    assert again['cid'] == out['cid'] and again['id'] != out['id']
+    assert os.listdir(appmod.PAYLOAD_DIR) == [out['cid']]
+
+
+def test_upload_rejects_oversized_and_empty(monkeypatch):
+    monkeypatch.setattr(appmod, 'MAX_UPLOAD_BYTES', 10)
+    assert client.post('/memories/upload', content=b'y' * 11).status_code == 413
+    assert client.post('/memories/upload', content=b'').status_code == 400
+    assert client.post('/memories/upload', params={'metadata': '[1]'}, content=b'z').status_code == 400
+    assert os.listdir(appmod.PAYLOAD_DIR) == []
+
+
+def test_upload_memory_is_constant_in_payload_size():
+    chunk = b'\x07' * 65536
+    chunks = 512  # 32 MiB
+
+    async def run():
+        sent = 0
+
+        async def receive():
+            nonlocal sent
+            sent += 1
+            return {'type': 'http.request', 'body': chunk, 'more_body': sent < chunks}
+        request = Request({'type': 'http', 'method': 'POST', 'path': '/memories/upload', 'headers': []}, receive)
+        return await appmod.upload_memory(request, title='big', summary=None, category='general', agent=None,
+                                          metadata=None, background_tasks=None)
+
+    tracemalloc.start()
+    try:
+        out = asyncio.run(run())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert out['size'] == len(chunk) * chunks
+    assert peak < 4 * 1024 * 1024
+
+
+def test_upload_io_runs_on_the_bulk_pool(monkeypatch):
+    seen = []
+    absorb = appmod._absorb
+
+    def spy(out, digest, chunk):
+        seen.append((threading.current_thread().name, appmod.WORK_CLASSES['bulk'].pending))
+        absorb(out, digest, chunk)
+    monkeypatch.setattr(appmod, '_absorb', spy)
+    assert client.post('/memories/upload', content=b'payload').status_code == 200
+    assert seen and all(name.startswith('nv-bulk') and pending == 1 for name, pending in seen)
+    assert appmod.WORK_CLASSES['bulk'].pending == 0
+    monkeypatch.setattr(appmod.WORK_CLASSES['bulk'], 'capacity', 0)
+    assert client.post('/memories/upload', content=b'payload').status_code == 503
+
+
+def test_temp_upload_files_are_not_served():
+    os.makedirs(appmod.PAYLOAD_DIR)
+    with open(os.path.join(appmod.PAYLOAD_DIR, '.upload-abc123'), 'wb') as f:
+        f.write(b'half written')
+    r = client.get('/ipfs/.upload-abc123')
+    assert r.status_code == 400 and b'half written' not in r.content
@@ -0,0 +1,149 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+from backend.validators import validator as vmod
+
+client = TestClient(appmod.app)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(vmod, 'RETRY_BASE_DELAY', 0)
+    monkeypatch.setattr(vmod.time, 'sleep', lambda s: None)
+
+
+class FlakySession:
+    """Fails every request while `down` is set, otherwise forwards to the app."""
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError('backend unavailable')
+        return client.post(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return client.get(url, **kwargs)
+
+
+def _validator(tmp_path):
+    vc = vmod.ValidatorClient('http://testserver', validator_key='k', spool_path=str(tmp_path / 'spool.jsonl'))
+    vc.session = FlakySession()
+    return vc
+
+
+def _seed(n):
+    return [client.post('/memories', json={'title': f'm{i}', 'summary': f'spooled {i}', 'agent': 'a'}).json()['id']
+            for i in range(n)]
+
+
+def test_validations_survive_outage_and_replay_in_batches(tmp_path):
+    ids = _seed(5)
+    vc = _validator(tmp_path)
+    for mid in ids:
+        assert vc.validate_and_submit({'id': mid, 'title': f'm{mid}', 'summary': 'spooled'})
+    assert vc.flush() == 0
+    assert vc.spool.pending() > 0
+    assert client.get('/validations').json() == []
+
+    # breaker is open: no more requests until the reset timeout passes
+    vc.breaker.threshold = 1
+    calls = vc.session.calls
+    vc.breaker.record_failure()
+    assert vc.flush() == 0 and vc.session.calls == calls
+
+    vc.breaker.reset_timeout = 0
+    vc.session.down = False
+    assert vc.flush() == 5
+    assert vc.spool.pending() == 0
+    assert sorted(v['memory_id'] for v in client.get('/validations').json()) == sorted(ids)
+    assert os.path.getsize(vc.spool.path) == 0
+
+
+def test_spool_resumes_from_committed_offset(tmp_path):
+    spool = vmod.Spool(str(tmp_path / 's.jsonl'))
+    for i in range(5):
+        spool.append({'memory_id': i})
+    records, offset = spool.peek(2)
+    assert [r['memory_id'] for r in records] == [0, 1]
+    spool.commit(offset)
+    # a new process picks up where the last commit left off
+    records, _ = vmod.Spool(spool.path).peek(10)
+    assert [r['memory_id'] for r in records] == [2, 3, 4]
+
+
+def test_stale_offset_after_truncation_is_ignored(tmp_path):
+    spool = vmod.Spool(str(tmp_path / 's.jsonl'))
+    # a crash between truncating a drained spool and resetting its offset
+    with open(spool.offset_path, 'w') as f:
+        f.write('4096')
+    spool.append({'memory_id': 7})
+    records, offset = spool.peek(10)
+    assert [r['memory_id'] for r in records] == [7]
+    spool.append({'memory_id': 8})
+    spool.commit(offset)
+    assert [r['memory_id'] for r in spool.peek(10)[0]] == [8]
+
+
+def test_validate_batch_endpoint_requires_scores():
+    ids = _seed(2)
+    r = client.post('/validate/batch', json={'validations': [
+        {'memory_id': ids[0], 'validator': 'v', 'score': 80, 'valid': True},
+        {'memory_id': ids[1], 'validator': 'v', 'score': 10, 'valid': False},
+    ]})
+    assert r.json() == {'ok': True, 'count': 2}
+    assert client.get(f'/memories/{ids[1]}').json()['memory']['status'] == 'FAILED'
+    assert client.post('/validate/batch', json={'validations': [{'memory_id': ids[0]}]}).status_code == 422
+    unknown = client.post('/validate/batch', json={'validations': [
+        {'memory_id': ids[0], 'score': 50, 'valid': True}, {'memory_id': 999, 'score': 50, 'valid': True}]})
+    assert unknown.status_code == 404 and unknown.json()['detail'] == 'memories not found: [999]'
+    assert len(client.get('/validations').json()) == 2
+
+
+class NoBatchSession(FlakySession):
+    """A backend without /validate/batch whose /validate fails once after the first record."""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.posted = []
+        self.fail_next = 1
+
+    def post(self, url, **kwargs):
+        if url.endswith('/validate/batch'):
+            return client.post('/no-such-route', **kwargs)
+        if self.posted and self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError('blip')
+        self.posted.append(kwargs['json']['memory_id'])
+        return client.post(url, **kwargs)
+
+
+@pytest.mark.parametrize('shards', [1, 2])
+def test_unknown_memories_are_dropped_not_retried(tmp_path, monkeypatch, shards):
+    monkeypatch.setattr(appmod, 'DB_PATH', str(tmp_path / 'catalog.sqlite3'))
+    monkeypatch.setattr(appmod, 'SHARD_COUNT', shards)
+    monkeypatch.setattr(appmod, 'SHARD_DIR', str(tmp_path / 'shards'))
+    appmod.init_db()
+    ids = _seed(3)
+    vc = _validator(tmp_path)
+    vc.session.down = False
+    for mid in ids[:2] + [9999] + ids[2:]:
+        vc.validate_and_submit({'id': mid, 'title': 'm', 'summary': 'spooled'})
+    assert vc.flush() == 4
+    assert vc.spool.pending() == 0
+    assert sorted(v['memory_id'] for v in client.get('/validations').json()) == sorted(ids)
+
+
+def test_fallback_without_batch_route_resends_only_undelivered(tmp_path):
+    ids = _seed(3)
+    vc = _validator(tmp_path)
+    vc.session = NoBatchSession()
+    for mid in ids:
+        vc.validate_and_submit({'id': mid, 'title': 'm', 'summary': 'spooled'})
+    assert vc.flush() == 3
+    assert vc.session.posted == ids
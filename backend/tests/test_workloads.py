@@ -0,0 +1,55 @@
+import threading
+import asyncio
+from fastapi.testclient import TestClient
+import backend.app_run as appmod
+
+client = TestClient(appmod.app)
+
+
+def test_handlers_are_async_and_run_on_their_class_pool(monkeypatch):
+    assert asyncio.iscoroutinefunction(appmod.get_memory)
+    seen = {}
+    real = appmod._scan_top_k
+
+    def spy(*args, **kwargs):
+        seen['thread'] = threading.current_thread().name
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(appmod, '_scan_top_k', spy)
+    assert client.get('/similar', params={'q': 'x'}).status_code == 200
+    assert seen['thread'].startswith('nv-search')
+
+
+def test_saturated_class_is_rejected_with_retry_after(monkeypatch):
+    work = appmod.WorkClass('search', workers=1, queue_limit=0, retry_after=7)
+    monkeypatch.setitem(appmod.WORK_CLASSES, 'search', work)
+    release = threading.Event()
+    blocker = work.pool.submit(release.wait)
+    work.pending = 1
+    try:
+        r = client.post('/embed', json={'texts': ['a']})
+        assert r.status_code == 503
+        assert r.headers['retry-after'] == '7'
+        # other classes are unaffected
+        assert client.get('/memories', params={'limit': 1}).status_code == 200
+    finally:
+        release.set()
+        blocker.result()
+        work.pending = 0
+    assert client.post('/embed', json={'texts': ['a']}).status_code == 200
+    assert work.pending == 0
+
+
+def test_check_cancelled_stops_offloaded_work():
+    event = threading.Event()
+    token = appmod._cancel_event.set(event)
+    try:
+        appmod.check_cancelled()
+        event.set()
+        try:
+            appmod.check_cancelled()
+            assert False, 'expected WorkloadCancelled'
+        except appmod.WorkloadCancelled:
+            pass
+    finally:
+        appmod._cancel_event.reset(token)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+backend/validators/simulator.py
+
+Local validator fleet simulator. Starts a throwaway backend (or targets an
+existing one), drives synthetic memory submissions at a given rate and runs N
+`ValidatorClient` instances concurrently, each with its own scoring policy
+and latency profile. When the run ends it prints (or writes) a JSON report
+with end-to-end validation latency, duplicate-validation rate, queue backlog
+over time and throughput, so pipeline changes can be compared run to run.
+
+Usage:
+  python backend/validators/simulator.py --validators 50 --rate 20 --duration 60 --out report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+try:
+	from .validator import ValidatorClient, compute_score_from_embedding, deterministic_embedding, default_scorer
+except ImportError:  # executed as a script
+	from validator import ValidatorClient, compute_score_from_embedding, deterministic_embedding, default_scorer
+
+LOG = logging.getLogger("nv.simulator")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PENDING = "PENDING_VALIDATION"
+
+
+def _threshold_scorer(threshold: int):
+	def scorer(memory: dict):
+		title = memory.get("title", "")
+		text = f"{title} {memory.get('summary','')}"
+		score = compute_score_from_embedding(deterministic_embedding(text), title, memory.get("category"))
+		return score, score >= threshold
+	return scorer
+
+
+def _coin_flip_scorer(memory: dict):
+	# deterministic per memory so repeated validations of one memory agree
+	rng = random.Random(memory.get("id"))
+	score = rng.randint(0, 1000)
+	return score, score >= 500
+
+
+# scoring policies a simulated validator can be given
+POLICIES = {
+	"default": default_scorer,
+	"strict": _threshold_scorer(600),
+	"lenient": _threshold_scorer(100),
+	"coin": _coin_flip_scorer,
+}
+
+# latency profiles: (mean, stddev) in seconds spent "thinking" before each submission
+LATENCIES = {
+	"fast": (0.01, 0.005),
+	"normal": (0.05, 0.02),
+	"slow": (0.25, 0.1),
+}
+
+
+class Metrics:
+	"""Thread-safe counters and timestamps shared by every simulated actor."""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.submitted: Dict[int, float] = {}
+		self.first_validated: Dict[int, float] = {}
+		self.validation_posts = 0
+		self.submit_errors = 0
+		self.validate_errors = 0
+		self.backlog: List[List[float]] = []
+
+	def record_submit(self, mid: int, at: float):
+		with self.lock:
+			self.submitted[mid] = at
+
+	def record_validation(self, mid: int, at: float):
+		with self.lock:
+			self.validation_posts += 1
+			self.first_validated.setdefault(mid, at)
+
+
+class SimulatedValidator(ValidatorClient):
+	def __init__(self, backend_url: str, name: str, policy: str, latency: str, metrics: Metrics, seed: int):
+		super().__init__(
+			backend_url,
+			validator_key="simulated",
+			scorer=POLICIES[policy],
+			validator_address=name,
+			# post directly so the report measures delivery, not spooling
+			spool_path=None,
+		)
+		self.name = name
+		self.policy = policy
+		self.latency = LATENCIES[latency]
+		self.metrics = metrics
+		self.rng = random.Random(seed)
+
+	def validate_and_submit(self, memory: dict) -> bool:
+		mean, stddev = self.latency
+		time.sleep(max(0.0, self.rng.gauss(mean, stddev)))
+		ok = super().validate_and_submit(memory)
+		if ok:
+			self.metrics.record_validation(memory.get("id"), time.monotonic())
+		else:
+			with self.metrics.lock:
+				self.metrics.validate_errors += 1
+		return ok
+
+	def run(self, stop: threading.Event, batch_size: int, poll_interval: float):
+		while not stop.is_set():
+			for memory in self.fetch_candidates(limit=batch_size, status=PENDING):
+				if stop.is_set():
+					break
+				self.validate_and_submit(memory)
+			stop.wait(poll_interval)
+
+
+def _free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+
+def start_local_backend(db_path: str, port: Optional[int] = None, timeout: float = 30.0):
+	"""Launch backend/app_run.py under uvicorn on a private DB; returns (process, url)."""
+	port = port or _free_port()
+	env = dict(os.environ)
+	env.update({
+		"DB_PATH": db_path,
+		"RATE_LIMIT_ENABLED": "false",
+		"NEIGHBOR_GRAPH_BUILD_ON_START": "false",
+		"CLUSTER_BUILD_ON_START": "false",
+	})
+	proc = subprocess.Popen(
+		[sys.executable, "-m", "uvicorn", "backend.app_run:app", "--host", "127.0.0.1", "--port", str(port),
+		 "--log-level", "warning"],
+		cwd=REPO_ROOT,
+		env=env,
+	)
+	url = f"http://127.0.0.1:{port}"
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if proc.poll() is not None:
+			raise RuntimeError(f"backend exited with code {proc.returncode}")
+		try:
+			if requests.get(f"{url}/memories", params={"limit": 1}, timeout=1).ok:
+				return proc, url
+		except requests.RequestException:
+			pass
+		time.sleep(0.2)
+	proc.terminate()
+	raise RuntimeError("backend did not become ready in time")
+
+
+def _submitter(url: str, rate: float, until: float, metrics: Metrics, rng: random.Random):
+	session = requests.Session()
+	n = 0
+	while time.monotonic() < until:
+		n += 1
+		memory = {
+			"agent": f"sim-agent-{rng.randrange(20)}",
+			"title": f"Simulated memory {n}",
+			"summary": " ".join(rng.choice(["research", "note", "data", "chain", "study", "memory"]) for _ in range(rng.randint(5, 60))),
+			"category": rng.choice(["science", "history", "art", "general"]),
+		}
+		try:
+			r = session.post(f"{url}/memories", json=memory, timeout=5)
+			r.raise_for_status()
+			metrics.record_submit(r.json()["id"], time.monotonic())
+		except Exception as e:
+			LOG.debug("submit failed: %s", e)
+			with metrics.lock:
+				metrics.submit_errors += 1
+		time.sleep(rng.expovariate(rate))
+
+
+def _sampler(url: str, started: float, stop: threading.Event, interval: float, metrics: Metrics):
+	session = requests.Session()
+	while not stop.is_set():
+		try:
+			r = session.get(f"{url}/memories", params={"status": PENDING, "fields": "id", "limit": 10 ** 7}, timeout=5)
+			r.raise_for_status()
+			with metrics.lock:
+				metrics.backlog.append([round(time.monotonic() - started, 3), len(r.json())])
+		except Exception as e:
+			LOG.debug("backlog sample failed: %s", e)
+		stop.wait(interval)
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+	if not values:
+		return None
+	ordered = sorted(values)
+	idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+	return round(ordered[idx], 4)
+
+
+def simulate(
+	validators: int = 10,
+	rate: float = 10.0,
+	duration: float = 30.0,
+	drain: float = 10.0,
+	batch_size: int = 5,
+	poll_interval: float = 1.0,
+	sample_interval: float = 1.0,
+	policies: Optional[List[str]] = None,
+	latencies: Optional[List[str]] = None,
+	backend_url: Optional[str] = None,
+	seed: int = 0,
+) -> dict:
+	"""Run one simulation and return its report as a JSON-serialisable dict.
+
+	Validators are assigned policies and latency profiles round-robin from
+	`policies`/`latencies`. Submissions stop after `duration` seconds; the
+	fleet then gets `drain` more seconds to work through the backlog.
+	"""
+	policies = policies or list(POLICIES)
+	latencies = latencies or list(LATENCIES)
+	proc = None
+	tmpdir = None
+	if backend_url is None:
+		tmpdir = tempfile.TemporaryDirectory(prefix="nv-sim-")
+		proc, backend_url = start_local_backend(os.path.join(tmpdir.name, "sim.sqlite3"))
+	metrics = Metrics()
+	stop = threading.Event()
+	rng = random.Random(seed)
+	fleet = [
+		SimulatedValidator(backend_url, f"sim-validator-{i}", policies[i % len(policies)],
+						   latencies[i % len(latencies)], metrics, seed + i)
+		for i in range(validators)
+	]
+	try:
+		started = time.monotonic()
+		threads = [threading.Thread(target=v.run, args=(stop, batch_size, poll_interval), daemon=True) for v in fleet]
+		threads.append(threading.Thread(target=_sampler, args=(backend_url, started, stop, sample_interval, metrics), daemon=True))
+		for t in threads:
+			t.start()
+		_submitter(backend_url, rate, started + duration, metrics, rng)
+		submit_window = time.monotonic() - started
+		stop.wait(drain)
+		stop.set()
+		for t in threads:
+			t.join(timeout=poll_interval + 5)
+		elapsed = time.monotonic() - started
+	finally:
+		stop.set()
+		if proc is not None:
+			proc.terminate()
+			proc.wait(timeout=10)
+		if tmpdir is not None:
+			tmpdir.cleanup()
+
+	with metrics.lock:
+		latency = [metrics.first_validated[m] - t for m, t in metrics.submitted.items() if m in metrics.first_validated]
+		validated = len(latency)
+		posts = metrics.validation_posts
+		report = {
+			"config": {
+				"validators": validators, "rate": rate, "duration": duration, "drain": drain,
+				"batch_size": batch_size, "poll_interval": poll_interval, "policies": policies,
+				"latencies": latencies, "seed": seed,
+			},
+			"submitted": len(metrics.submitted),
+			"validated": validated,
+			"unvalidated": len(metrics.submitted) - validated,
+			"validation_posts": posts,
+			"duplicate_validations": posts - len(metrics.first_validated),
+			"duplicate_rate": round((posts - len(metrics.first_validated)) / posts, 4) if posts else 0.0,
+			"latency_s": {
+				"mean": round(sum(latency) / validated, 4) if validated else None,
+				"p50": _percentile(latency, 50),
+				"p90": _percentile(latency, 90),
+				"p99": _percentile(latency, 99),
+				"max": round(max(latency), 4) if latency else None,
+			},
+			"throughput": {
+				"submissions_per_s": round(len(metrics.submitted) / submit_window, 3) if submit_window else 0.0,
+				"validations_per_s": round(posts / elapsed, 3) if elapsed else 0.0,
+			},
+			"errors": {"submit": metrics.submit_errors, "validate": metrics.validate_errors},
+			"backlog": metrics.backlog,
+		}
+	return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	ap = argparse.ArgumentParser(description="Simulate a validator fleet against a local backend")
+	ap.add_argument("--validators", type=int, default=10, help="Number of simulated validators")
+	ap.add_argument("--rate", type=float, default=10.0, help="Synthetic submissions per second")
+	ap.add_argument("--duration", type=float, default=30.0, help="Seconds to keep submitting")
+	ap.add_argument("--drain", type=float, default=10.0, help="Extra seconds for validators after submissions stop")
+	ap.add_argument("--batch-size", type=int, default=5, help="Candidates fetched per validator poll")
+	ap.add_argument("--poll-interval", type=float, default=1.0, help="Validator poll interval (s)")
+	ap.add_argument("--sample-interval", type=float, default=1.0, help="Backlog sampling interval (s)")
+	ap.add_argument("--policies", default=",".join(POLICIES), help="Comma-separated scoring policies to rotate through")
+	ap.add_argument("--latencies", default=",".join(LATENCIES), help="Comma-separated latency profiles to rotate through")
+	ap.add_argument("--backend", default=None, help="Use an already running backend instead of starting one")
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+	args = ap.parse_args(argv)
+
+	report = simulate(
+		validators=args.validators,
+		rate=args.rate,
+		duration=args.duration,
+		drain=args.drain,
+		batch_size=args.batch_size,
+		poll_interval=args.poll_interval,
+		sample_interval=args.sample_interval,
+		policies=[p for p in args.policies.split(",") if p],
+		latencies=[l for l in args.latencies.split(",") if l],
+		backend_url=args.backend,
+		seed=args.seed,
+	)
+	text = json.dumps(report, indent=2)
+	if args.out:
+		with open(args.out, "w") as f:
+			f.write(text)
+	else:
+		print(text)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
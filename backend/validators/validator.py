@@ -5,7 +5,9 @@ backend/validators/validator.py
 Lightweight validator automation. Polls the backend for candidate memories,
 computes a deterministic embedding, applies a simple heuristic, and posts
 the validation to the backend. If `VALIDATOR_KEY` is not set, runs in dry-run
-mode and prints the intended action instead of submitting on-chain.
+mode and prints the intended action instead of submitting on-chain. With
+`RPC_URL` and `MEMORY_REGISTRY_ADDRESS` also set, validations are batched into
+MemoryRegistryV2.storeMemory transactions as well (see ChainSubmitter).
 
 This file replaces prior concatenated/duplicated copies and is intentionally
 minimal so it can be run in CI or locally. TODO markers are left for
@@ -16,11 +18,14 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import json
 import logging
 import os
+import random
 import sys
+import threading
 import time
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 
 import requests
 
@@ -31,6 +36,48 @@ BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 VALIDATOR_KEY = os.getenv("VALIDATOR_KEY")  # if missing, run in dry-run
 POLL_INTERVAL = int(os.getenv("VALIDATOR_POLL_INTERVAL", "30"))
 BATCH_SIZE = int(os.getenv("VALIDATOR_BATCH_SIZE", "5"))
+# results are appended here before delivery; set to "" to post directly
+SPOOL_PATH = os.getenv("VALIDATOR_SPOOL_PATH", os.path.join("data", "validator_spool.jsonl"))
+SPOOL_BATCH = int(os.getenv("VALIDATOR_SPOOL_BATCH", "100"))
+RETRY_ATTEMPTS = int(os.getenv("VALIDATOR_RETRY_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("VALIDATOR_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("VALIDATOR_RETRY_MAX_DELAY", "30"))
+BREAKER_THRESHOLD = int(os.getenv("VALIDATOR_BREAKER_THRESHOLD", "3"))
+BREAKER_RESET = float(os.getenv("VALIDATOR_BREAKER_RESET", "30"))
+RPC_URL = os.getenv("RPC_URL")
+MEMORY_REGISTRY_ADDRESS = os.getenv("MEMORY_REGISTRY_ADDRESS")
+CHAIN_BATCH_SIZE = int(os.getenv("VALIDATOR_CHAIN_BATCH", "50"))
+CHAIN_MAX_PENDING = int(os.getenv("VALIDATOR_CHAIN_MAX_PENDING", "16"))
+RECEIPT_POLL_INTERVAL = float(os.getenv("VALIDATOR_RECEIPT_POLL_INTERVAL", "2"))
+# a transaction without a receipt after this long is taken as dropped and re-sent
+RECEIPT_TIMEOUT = float(os.getenv("VALIDATOR_RECEIPT_TIMEOUT", "300"))
+CHAIN_MAX_RETRIES = int(os.getenv("VALIDATOR_CHAIN_MAX_RETRIES", "3"))
+# batches that still fail after CHAIN_MAX_RETRIES re-sends; set to "" to only log them
+CHAIN_DEAD_LETTER_PATH = os.getenv("VALIDATOR_CHAIN_DEAD_LETTER_PATH", os.path.join("data", "validator_chain_dead.jsonl"))
+# storeMemory ids of validation batches carry this top bit, so they never meet the
+# small sequential ids of Merkle anchor batches (backend anchor_id) from the same key
+VALIDATION_BATCH_ID_TAG = 1 << 255
+
+# only the function the submitter calls; avoids depending on the hardhat artifacts
+REGISTRY_ABI = [
+	{
+		"type": "function",
+		"name": "storeMemory",
+		"stateMutability": "nonpayable",
+		"inputs": [{"name": "id", "type": "uint256"}, {"name": "data", "type": "string"}],
+		"outputs": [],
+	},
+	{
+		"type": "event",
+		"name": "MemoryStored",
+		"anonymous": False,
+		"inputs": [
+			{"name": "sender", "type": "address", "indexed": True},
+			{"name": "id", "type": "uint256", "indexed": True},
+			{"name": "data", "type": "string", "indexed": False},
+		],
+	},
+]
 
 
 def deterministic_embedding(text: str, dim: int = 8) -> List[float]:
@@ -56,18 +103,367 @@ def compute_score_from_embedding(embedding: List[float], title: str, category: O
 	return score
 
 
+# (memory) -> (score, is_valid); lets callers plug in their own scoring policy
+Scorer = Callable[[dict], Tuple[int, bool]]
+
+
+def default_scorer(memory: dict) -> Tuple[int, bool]:
+	title = memory.get("title", "")
+	text = f"{title} {memory.get('summary','')}"
+	score = compute_score_from_embedding(deterministic_embedding(text), title, memory.get("category"))
+	return score, score >= 300
+
+
+class Spool:
+	"""Append-only JSONL spool of validation results awaiting delivery.
+
+	Records are appended to `path`; a sidecar `<path>.offset` file holds the
+	byte offset of the first undelivered record and is replaced atomically
+	after each delivered batch, so a crash at any point only ever re-sends
+	(never loses) a batch. Once everything is delivered the file is truncated.
+	"""
+
+	def __init__(self, path: str):
+		self.path = path
+		self.offset_path = path + ".offset"
+		self._lock = threading.Lock()
+		directory = os.path.dirname(os.path.abspath(path))
+		os.makedirs(directory, exist_ok=True)
+		open(self.path, "a").close()
+
+	def append(self, record: dict):
+		line = json.dumps(record, separators=(",", ":")) + "\n"
+		with self._lock, open(self.path, "a") as f:
+			f.write(line)
+			f.flush()
+
+	def _offset(self) -> int:
+		try:
+			with open(self.offset_path) as f:
+				offset = int(f.read().strip() or 0)
+		except (OSError, ValueError):
+			return 0
+		# past the end means the file was truncated after the offset was read back
+		return offset if offset <= os.path.getsize(self.path) else 0
+
+	def _write_offset(self, offset: int):
+		tmp = self.offset_path + ".tmp"
+		with open(tmp, "w") as f:
+			f.write(str(offset))
+		os.replace(tmp, self.offset_path)
+
+	def peek(self, limit: int) -> Tuple[List[dict], int]:
+		"""Return up to `limit` pending records and the offset just past them."""
+		records: List[dict] = []
+		with self._lock, open(self.path, "rb") as f:
+			offset = self._offset()
+			f.seek(offset)
+			while len(records) < limit:
+				line = f.readline()
+				if not line.endswith(b"\n"):
+					break  # end of file, or a record still being written
+				offset += len(line)
+				try:
+					records.append(json.loads(line))
+				except ValueError:
+					LOG.warning("Skipping corrupt spool record at offset %d", offset - len(line))
+		return records, offset
+
+	def commit(self, offset: int):
+		"""Mark everything before `offset` delivered."""
+		with self._lock:
+			if offset >= os.path.getsize(self.path):
+				# fully drained: start a fresh file rather than growing forever. The
+				# offset is reset first, so a crash in between re-sends, never skips.
+				self._write_offset(0)
+				open(self.path, "w").close()
+			else:
+				self._write_offset(offset)
+
+	def pending(self) -> int:
+		with self._lock:
+			return max(0, os.path.getsize(self.path) - self._offset())
+
+
+class CircuitBreaker:
+	"""Stops calls to a failing backend for `reset_timeout` seconds after `threshold` failures.
+
+	After the timeout one trial call is let through (half-open); success
+	closes the breaker again, failure re-opens it.
+	"""
+
+	def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+		self.threshold = threshold
+		self.reset_timeout = reset_timeout
+		self.failures = 0
+		self.opened_at: Optional[float] = None
+
+	def allow(self) -> bool:
+		if self.opened_at is None:
+			return True
+		return time.monotonic() - self.opened_at >= self.reset_timeout
+
+	def record_success(self):
+		self.failures = 0
+		self.opened_at = None
+
+	def record_failure(self):
+		self.failures += 1
+		if self.failures >= self.threshold or self.opened_at is not None:
+			self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+	"""Exponential backoff with full jitter."""
+	return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _missing_memories(r) -> Optional[set]:
+	"""Memory ids from /validate/batch's "memories not found" 404; None for any other 404 (no such route)."""
+	try:
+		detail = r.json().get("detail")
+	except (ValueError, AttributeError):
+		return None
+	prefix = "memories not found:"
+	if not isinstance(detail, str) or not detail.startswith(prefix):
+		return None
+	try:
+		return set(json.loads(detail[len(prefix):]))
+	except ValueError:
+		return None
+
+
+def encode_validation_batch(records: List[dict]) -> str:
+	"""Pack validations into the compact `data` string of one storeMemory call."""
+	rows = [[r["memory_id"], int(r["score"]), 1 if r["valid"] else 0] for r in records]
+	return json.dumps({"type": "validations", "v": 1, "rows": rows}, separators=(",", ":"))
+
+
+def decode_validation_batch(data: str) -> List[dict]:
+	doc = json.loads(data)
+	return [{"memory_id": mid, "score": score, "valid": bool(valid)} for mid, score, valid in doc["rows"]]
+
+
+class ChainSubmitter:
+	"""Submits validations to MemoryRegistryV2 in batches.
+
+	Validations accumulate until `batch_size` are waiting, then go out as one
+	`storeMemory(id, data)` transaction with the batch JSON-encoded in `data`.
+	`id` is the batch's own record id: VALIDATION_BATCH_ID_TAG over a
+	time-based counter that only grows, kept across re-sends so readers can
+	drop duplicates. Nonces are handed out locally so several transactions
+	can be in flight at once without a round trip per send; at most
+	`max_pending` are allowed before `add()` blocks on receipts.
+
+	A background thread polls receipts. Mined batches are done. Reverted
+	ones, and ones with no receipt after `receipt_timeout` (dropped from the
+	mempool), are sent again up to `max_retries` times and then dead-lettered:
+	kept in `dead_letters` and appended to `dead_letter` if given.
+
+	web3 is only imported here, so the rest of the validator runs without it.
+	"""
+
+	def __init__(
+		self,
+		w3,
+		contract_address: str,
+		private_key: Optional[str] = None,
+		sender: Optional[str] = None,
+		batch_size: int = CHAIN_BATCH_SIZE,
+		max_pending: int = CHAIN_MAX_PENDING,
+		poll_interval: float = RECEIPT_POLL_INTERVAL,
+		receipt_timeout: float = RECEIPT_TIMEOUT,
+		max_retries: int = CHAIN_MAX_RETRIES,
+		dead_letter: Optional[Spool] = None,
+	):
+		self.w3 = w3
+		self.contract = w3.eth.contract(address=w3.to_checksum_address(contract_address), abi=REGISTRY_ABI)
+		self.account = w3.eth.account.from_key(private_key) if private_key else None
+		# without a key the node must hold `sender` unlocked (eth-tester, hardhat)
+		self.sender = self.account.address if self.account else w3.to_checksum_address(sender or w3.eth.accounts[0])
+		self.batch_size = batch_size
+		self.max_pending = max_pending
+		self.poll_interval = poll_interval
+		self.receipt_timeout = receipt_timeout
+		self.max_retries = max_retries
+		self.dead_letter = dead_letter
+		self.queue: List[dict] = []
+		self.retries: List[dict] = []  # batches to send again, ahead of the queue
+		self.inflight: dict = {}  # tx hash -> (nonce, batch, sent at)
+		self.dead_letters: List[dict] = []
+		self.confirmed = 0
+		self.failed = 0
+		self._nonce: Optional[int] = None
+		self._record_id = 0
+		self._lock = threading.RLock()
+		self._settled = threading.Condition(self._lock)
+		self._stop = threading.Event()
+		self._tracker: Optional[threading.Thread] = None
+
+	@classmethod
+	def from_env(cls, private_key: Optional[str]) -> Optional["ChainSubmitter"]:
+		if not (RPC_URL and MEMORY_REGISTRY_ADDRESS and private_key):
+			return None
+		from web3 import Web3
+
+		dead_letter = Spool(CHAIN_DEAD_LETTER_PATH) if CHAIN_DEAD_LETTER_PATH else None
+		return cls(Web3(Web3.HTTPProvider(RPC_URL)), MEMORY_REGISTRY_ADDRESS, private_key=private_key, dead_letter=dead_letter)
+
+	def start(self):
+		if self._tracker is None:
+			self._tracker = threading.Thread(target=self._track_receipts, name="nv-receipts", daemon=True)
+			self._tracker.start()
+		return self
+
+	def add(self, payload: dict):
+		with self._lock:
+			self.queue.append(payload)
+			while self.retries or len(self.queue) >= self.batch_size:
+				self._send(self.batch_size)
+
+	def flush(self):
+		"""Send whatever is queued, even a partial batch."""
+		with self._lock:
+			while self.retries or self.queue:
+				self._send(self.batch_size)
+
+	def _next_nonce(self) -> int:
+		if self._nonce is None:
+			self._nonce = self.w3.eth.get_transaction_count(self.sender, "pending")
+		nonce = self._nonce
+		self._nonce += 1
+		return nonce
+
+	def _next_record_id(self) -> int:
+		# microseconds since the epoch, or one past the last id if that is later: ids keep
+		# growing within a run and across restarts without a counter stored anywhere
+		self._record_id = max(self._record_id + 1, time.time_ns() // 1000)
+		return VALIDATION_BATCH_ID_TAG | self._record_id
+
+	def _send(self, n: int):
+		while len(self.inflight) >= self.max_pending:
+			# backpressure: wait for the tracker to settle something
+			self._settled.wait(self.poll_interval)
+			self._poll_once()
+		if self.retries:
+			batch = self.retries.pop(0)
+		else:
+			records, self.queue = self.queue[:n], self.queue[n:]
+			batch = {"id": self._next_record_id(), "records": records, "attempts": 0}
+		records = batch["records"]
+		nonce = self._next_nonce()
+		call = self.contract.functions.storeMemory(batch["id"], encode_validation_batch(records))
+		try:
+			if self.account is not None:
+				tx = call.build_transaction({"from": self.sender, "nonce": nonce, "chainId": self.w3.eth.chain_id})
+				signed = self.account.sign_transaction(tx)
+				tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
+			else:
+				tx_hash = call.transact({"from": self.sender, "nonce": nonce})
+		except Exception as e:
+			# the nonce may or may not have been consumed; re-read it next time
+			self._nonce = None
+			self.retries.insert(0, batch)
+			LOG.error("Failed to send batch of %d validations (nonce %d): %s", len(records), nonce, e)
+			raise
+		self.inflight[tx_hash] = (nonce, batch, time.monotonic())
+		LOG.info("Sent %d validations in tx %s (nonce %d)", len(records), tx_hash.hex(), nonce)
+
+	def _retry(self, batch: dict, why: str):
+		self.failed += len(batch["records"])
+		batch["attempts"] += 1
+		if batch["attempts"] <= self.max_retries:
+			self.retries.append(batch)
+			LOG.warning("Batch %d %s; re-sending (attempt %d of %d)", batch["id"], why, batch["attempts"], self.max_retries)
+			return
+		self.dead_letters.append(batch)
+		if self.dead_letter is not None:
+			for record in batch["records"]:
+				self.dead_letter.append({**record, "batch_id": batch["id"]})
+		LOG.error("Batch %d %s after %d re-sends; dead-lettered %d validations", batch["id"], why, self.max_retries, len(batch["records"]))
+
+	def _poll_once(self):
+		with self._lock:
+			pending = list(self.inflight.items())
+		for tx_hash, (nonce, batch, sent_at) in pending:
+			try:
+				receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+			except Exception:
+				receipt = None  # not mined yet
+			if receipt is None and time.monotonic() - sent_at < self.receipt_timeout:
+				continue
+			with self._lock:
+				if self.inflight.pop(tx_hash, None) is None:
+					continue  # settled concurrently by the tracker or wait()
+				if receipt is None:
+					# dropped: its nonce was never used, so later sends must re-read it
+					self._nonce = None
+					self._retry(batch, f"tx {tx_hash.hex()} (nonce {nonce}) has no receipt")
+				elif receipt["status"] == 1:
+					self.confirmed += len(batch["records"])
+				else:
+					self._retry(batch, f"tx {tx_hash.hex()} (nonce {nonce}) reverted")
+				self._settled.notify_all()
+
+	def _track_receipts(self):
+		while not self._stop.is_set():
+			self._poll_once()
+			self._stop.wait(self.poll_interval)
+
+	def wait(self, timeout: Optional[float] = None) -> bool:
+		"""Block until every sent transaction has a receipt; returns False on timeout."""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		with self._lock:
+			while self.inflight:
+				remaining = None if deadline is None else deadline - time.monotonic()
+				if remaining is not None and remaining <= 0:
+					return False
+				self._settled.wait(min(self.poll_interval, remaining) if remaining is not None else self.poll_interval)
+				self._poll_once()
+		return True
+
+	def close(self, timeout: Optional[float] = None) -> bool:
+		"""Send everything, re-sends included, and wait for the receipts; False on timeout."""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			self.flush()
+			done = self.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+			with self._lock:
+				if not done or not self.retries:
+					break
+		self._stop.set()
+		return done
+
+
 class ValidatorClient:
-	def __init__(self, backend_url: str, validator_key: Optional[str] = None, dry_run: bool = False):
+	def __init__(
+		self,
+		backend_url: str,
+		validator_key: Optional[str] = None,
+		dry_run: bool = False,
+		scorer: Optional[Scorer] = None,
+		validator_address: Optional[str] = None,
+		spool_path: Optional[str] = SPOOL_PATH,
+		chain: Optional[ChainSubmitter] = None,
+	):
 		self.backend_url = backend_url.rstrip("/")
 		self.validator_key = validator_key
 		self.dry_run = dry_run or (validator_key is None)
+		self.scorer = scorer or default_scorer
+		self.validator_address = validator_address or os.getenv("VALIDATOR_ADDRESS", "0x" + "0" * 40)
 		self.session = requests.Session()
+		self.spool = Spool(spool_path) if spool_path and not self.dry_run else None
+		self.breaker = CircuitBreaker()
+		self.chain = None if self.dry_run else chain
 		if self.dry_run:
 			LOG.warning("VALIDATOR_KEY not set -> running in dry-run mode (no on-chain submission)")
 
-	def fetch_candidates(self, limit: int = BATCH_SIZE):
+	def fetch_candidates(self, limit: int = BATCH_SIZE, status: Optional[str] = None):
+		params = {"limit": limit}
+		if status:
+			params["status"] = status
 		try:
-			r = self.session.get(f"{self.backend_url}/memories", params={"limit": limit}, timeout=5)
+			r = self.session.get(f"{self.backend_url}/memories", params=params, timeout=5)
 			r.raise_for_status()
 			data = r.json()
 			# backend may return schema; we treat items as candidate memories
@@ -78,26 +474,36 @@ class ValidatorClient:
 
 	def validate_and_submit(self, memory: dict) -> bool:
 		mid = memory.get("id")
-		title = memory.get("title", "")
-		category = memory.get("category")
-		text = f"{title} {memory.get('summary','')}"
-
-		emb = deterministic_embedding(text)
-		score = compute_score_from_embedding(emb, title, category)
-		is_valid = score >= 300
+		score, is_valid = self.scorer(memory)
+		explanation = f"Auto-decided (dry-run={self.dry_run})"
 
+		# `valid`/`reason` are the keys backend/app_run.py reads; without them the
+		# post is treated as a trigger and the backend re-scores the memory itself
 		payload = {
 			"memory_id": mid,
 			"is_valid": bool(is_valid),
+			"valid": bool(is_valid),
 			"score": int(score),
-			"explanation": f"Auto-decided (dry-run={self.dry_run})",
-			"validator": os.getenv("VALIDATOR_ADDRESS", "0x" + "0" * 40),
+			"explanation": explanation,
+			"reason": explanation,
+			"validator": self.validator_address,
 		}
 
 		if self.dry_run:
 			LOG.info("Dry-run: would submit validation: %s", payload)
 			return True
 
+		if self.chain is not None:
+			try:
+				self.chain.add(payload)
+			except Exception:
+				pass  # logged and requeued by the submitter; retried on the next send
+
+		if self.spool is not None:
+			# durable first; delivery happens in batches from flush()
+			self.spool.append(payload)
+			return True
+
 		try:
 			r = self.session.post(f"{self.backend_url}/validate", json=payload, timeout=5)
 			r.raise_for_status()
@@ -107,30 +513,126 @@ class ValidatorClient:
 			LOG.error("Failed to submit validation for %s: %s", mid, e)
 			return False
 
+	def _post_batch(self, records: List[dict]):
+		"""Deliver one batch, retrying transient failures with backoff.
+
+		Raises after the last attempt. A 4xx other than 408/429 means the
+		records themselves are bad, so they are logged and dropped rather
+		than retried forever. Records for memories the backend doesn't know
+		are dropped the same way and the rest of the batch is re-sent.
+		"""
+		pending = list(records)
+		for attempt in range(RETRY_ATTEMPTS):
+			try:
+				while True:
+					r = self.session.post(f"{self.backend_url}/validate/batch", json={"validations": pending}, timeout=10)
+					missing = _missing_memories(r) if r.status_code == 404 else None
+					if not missing:
+						break
+					kept = [rec for rec in pending if rec.get("memory_id") not in missing]
+					LOG.error("Dropping %d spooled validations for unknown memories %s",
+							  len(pending) - len(kept), sorted(missing))
+					if not kept or len(kept) == len(pending):
+						return
+					pending = kept
+				if r.status_code == 404:
+					# backend without the batch endpoint
+					self._post_each(pending)
+					return
+				if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+					LOG.error("Backend rejected %d spooled validations (%s): %s", len(records), r.status_code, r.text[:200])
+					return
+				r.raise_for_status()
+				return
+			except Exception as e:
+				if attempt == RETRY_ATTEMPTS - 1:
+					raise
+				delay = backoff_delay(attempt)
+				LOG.warning("Batch delivery failed (%s); retrying in %.2fs", e, delay)
+				time.sleep(delay)
+
+	def _post_each(self, records: List[dict]):
+		# delivered records leave the list, so a retry only re-sends the rest
+		while records:
+			r = self.session.post(f"{self.backend_url}/validate", json=records[0], timeout=5)
+			if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+				LOG.error("Backend rejected spooled validation for memory %s (%s): %s",
+						  records[0].get("memory_id"), r.status_code, r.text[:200])
+			else:
+				r.raise_for_status()
+			records.pop(0)
+
+	def flush(self) -> int:
+		"""Drain the spool in batches; returns the number of validations delivered.
+
+		Stops early, leaving the rest spooled, when the circuit breaker is open
+		or a batch still fails after its retries.
+		"""
+		if self.chain is not None:
+			try:
+				self.chain.flush()
+			except Exception:
+				pass  # logged and requeued by the submitter
+		if self.spool is None:
+			return 0
+		delivered = 0
+		while self.breaker.allow():
+			records, offset = self.spool.peek(SPOOL_BATCH)
+			if not records:
+				self.spool.commit(offset)
+				break
+			try:
+				self._post_batch(records)
+			except Exception as e:
+				self.breaker.record_failure()
+				LOG.error("Spool drain paused, %d bytes pending: %s", self.spool.pending(), e)
+				break
+			self.breaker.record_success()
+			self.spool.commit(offset)
+			delivered += len(records)
+		if delivered:
+			LOG.info("Delivered %d spooled validations", delivered)
+		return delivered
+
+
+def _chain_from_env(dry_run: bool) -> Optional[ChainSubmitter]:
+	if dry_run:
+		return None
+	chain = ChainSubmitter.from_env(VALIDATOR_KEY)
+	return chain.start() if chain is not None else None
+
 
 def run_once(backend_url: str, dry_run: bool = False):
-	client = ValidatorClient(backend_url, VALIDATOR_KEY, dry_run=dry_run)
+	chain = _chain_from_env(dry_run)
+	client = ValidatorClient(backend_url, VALIDATOR_KEY, dry_run=dry_run, chain=chain)
 	candidates = client.fetch_candidates(limit=BATCH_SIZE)
 	count = 0
 	for m in candidates:
 		ok = client.validate_and_submit(m)
 		if ok:
 			count += 1
+	client.flush()
+	if chain is not None:
+		chain.close(timeout=120)
 	LOG.info("Processed %d candidates", count)
 	return count
 
 
 def run_daemon(backend_url: str, interval: int = POLL_INTERVAL, dry_run: bool = False):
 	LOG.info("Starting validator daemon (interval=%s)s", interval)
-	client = ValidatorClient(backend_url, VALIDATOR_KEY, dry_run=dry_run)
+	chain = _chain_from_env(dry_run)
+	client = ValidatorClient(backend_url, VALIDATOR_KEY, dry_run=dry_run, chain=chain)
 	try:
 		while True:
 			candidates = client.fetch_candidates(limit=BATCH_SIZE)
 			for m in candidates:
 				client.validate_and_submit(m)
+			client.flush()
 			time.sleep(interval)
 	except KeyboardInterrupt:
 		LOG.info("Validator daemon stopped by user")
+		if chain is not None:
+			chain.close(timeout=30)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
@@ -154,7 +154,9 @@ export function MemoryGallery() {
         for (let i = 0; i < cids.length; i++) {
           const cid = cids[i];
           try {
-            const url = `${(import.meta.env as any).VITE_IPFS_GATEWAY_BASE || 'https://ipfs.io'}/ipfs/${cid}`;
+            // the backend's /ipfs proxy verifies and caches payloads; a public gateway is the last resort
+            const env = import.meta.env as any;
+            const url = `${env.VITE_IPFS_GATEWAY_BASE || env.VITE_BACKEND_URL || 'https://ipfs.io'}/ipfs/${cid}`;
             const resp = await fetch(url);
             if (!resp.ok) continue;
             const json = await resp.json();